@@ -1,19 +1,331 @@
+import asyncio
+import base64
+import fnmatch
+import json
+import os
+import pickle
+import sys
 import time
-from typing import Dict, Any, Optional
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Awaitable, Callable, Container, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import logging
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from app.models import CachedResponse, PostSummary
+
+load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-class SimpleCache:
-    """Simple in-memory cache with TTL support"""
+def approximate_size(value: Any) -> int:
+    """Approximate the memory footprint of a cached value in bytes"""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+# Key prefixes followed by an id; all their keys are counted as one "<prefix>*" namespace
+NAMESPACE_PREFIXES = ("post_",)
+
+def cache_namespace(key: str) -> str:
+    """Namespace a cache key is counted under, e.g. post_* for every post"""
+    for prefix in NAMESPACE_PREFIXES:
+        if key.startswith(prefix):
+            return prefix + "*"
+    return key
+
+def is_gone(error: BaseException) -> bool:
+    """Check whether a fill failed because its value no longer exists (an HTTP 404)"""
+    return getattr(error, "status_code", None) == 404
+
+class CacheCounters:
+    """Cache counters per key namespace, updated as operations happen.
+    
+    Reading them costs O(namespaces) rather than O(entries) and changes
+    nothing. Entries and bytes are only tracked by the in-memory cache.
+    """
+    
+    FIELDS = (
+        "hits", "stale_hits", "misses", "fills", "fill_errors", "fill_seconds", "max_fill_seconds",
+        "evictions", "expirations", "entries", "bytes"
+    )
+    
+    def __init__(self):
+        self.namespaces: Dict[str, Dict[str, float]] = {}
+    
+    def namespace(self, key: str) -> Dict[str, float]:
+        """Counters of the namespace key belongs to"""
+        name = cache_namespace(key)
+        counters = self.namespaces.get(name)
+        if counters is None:
+            counters = self.namespaces[name] = dict.fromkeys(self.FIELDS, 0)
+        return counters
+    
+    def count(self, key: str, field: str, amount: float = 1) -> None:
+        """Add to one of key's namespace counters"""
+        self.namespace(key)[field] += amount
+    
+    def fill(self, key: str, seconds: float) -> None:
+        """Count a fill of key by its factory, which took `seconds`"""
+        counters = self.namespace(key)
+        counters["fills"] += 1
+        counters["fill_seconds"] += seconds
+        counters["max_fill_seconds"] = max(counters["max_fill_seconds"], seconds)
+    
+    def clear_entries(self) -> None:
+        """Zero the entry and byte counts after the cache was cleared"""
+        for counters in self.namespaces.values():
+            counters["entries"] = counters["bytes"] = 0
+    
+    def stats(self, entries: bool = False) -> Dict[str, Any]:
+        """Hit ratios, fill latencies and (with `entries`) sizes overall and per namespace"""
+        namespaces = {name: self._summary(counters, entries) for name, counters in sorted(self.namespaces.items())}
+        totals = {
+            field: sum(counters[field] for counters in self.namespaces.values())
+            for field in ("hits", "stale_hits", "misses", "fills", "fill_errors")
+        }
+        return {**totals, "hit_ratio": self._hit_ratio(totals), "namespaces": namespaces}
+    
+    def _summary(self, counters: Dict[str, float], entries: bool) -> Dict[str, Any]:
+        """Readable statistics of one namespace"""
+        summary = {
+            "hits": counters["hits"],
+            "stale_hits": counters["stale_hits"],
+            "misses": counters["misses"],
+            "hit_ratio": self._hit_ratio(counters),
+            "fills": counters["fills"],
+            "fill_errors": counters["fill_errors"],
+            "mean_fill_ms": round(counters["fill_seconds"] / counters["fills"] * 1000, 3) if counters["fills"] else None,
+            "max_fill_ms": round(counters["max_fill_seconds"] * 1000, 3)
+        }
+        if entries:
+            summary.update(
+                entries=counters["entries"],
+                bytes=counters["bytes"],
+                evictions=counters["evictions"],
+                expirations=counters["expirations"]
+            )
+        return summary
+    
+    def _hit_ratio(self, counters: Dict[str, float]) -> Optional[float]:
+        """Share of lookups answered from the cache, stale values included"""
+        hits = counters["hits"] + counters["stale_hits"]
+        lookups = hits + counters["misses"]
+        return round(hits / lookups, 4) if lookups else None
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single in-flight call"""
     
-    def __init__(self, default_ttl: int = 300):  # 5 minutes default TTL
-        self.cache: Dict[str, Dict[str, Any]] = {}
+    def __init__(self):
+        self.calls: Dict[str, "asyncio.Future[Any]"] = {}
+    
+    def start(self, key: str, fn: Callable[[], Awaitable[Any]]) -> "asyncio.Future[Any]":
+        """Start fn for key unless a call for key is already in flight"""
+        call = self.calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(fn())
+            self.calls[key] = call
+            call.add_done_callback(lambda _: self.calls.pop(key, None))
+        else:
+            logger.debug(f"Joining in-flight call for key '{key}'")
+        return call
+    
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        timeout: Optional[float] = None
+    ) -> Any:
+        """Run fn once per key; concurrent callers await the same result.
+        
+        Callers stop waiting after `timeout` seconds and get an
+        asyncio.TimeoutError; the in-flight call keeps running so its
+        result still reaches the cache.
+        """
+        return await asyncio.wait_for(asyncio.shield(self.start(key, fn)), timeout)
+
+class CacheBackend(ABC):
+    """Interface shared by the cache backends.
+    
+    Backends store entries (a value with its stale_at/expires_at
+    timestamps); single-flight fills and stale-while-revalidate are
+    implemented here on top of them.
+    """
+    
+    def __init__(self, default_ttl: int = 300):
         self.default_ttl = default_ttl
+        self.flights = SingleFlight()
+        self.counters = CacheCounters()
+    
+    @abstractmethod
+    async def get_item(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get the cache entry (value and timestamps) if not expired"""
+    
+    @abstractmethod
+    async def set_item(self, key: str, item: Dict[str, Any]) -> None:
+        """Store a cache entry"""
+    
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        """Delete key from cache"""
+    
+    @abstractmethod
+    async def clear(self) -> None:
+        """Clear all cache entries"""
+    
+    @abstractmethod
+    async def clear_pattern(self, pattern: str) -> int:
+        """Clear cache entries matching a pattern (supports * wildcard)"""
+    
+    @abstractmethod
+    async def stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+    
+    async def connect(self) -> None:
+        """Open connections to the backing store (called on app startup)"""
+    
+    async def close(self) -> None:
+        """Close connections to the backing store (called on app shutdown)"""
     
-    def get(self, key: str) -> Optional[Any]:
-        """Get value from cache if not expired"""
+    def cleanup_expired(self) -> int:
+        """Remove expired entries and return count"""
+        return 0
+    
+    async def sweep_expired(self, interval: float) -> None:
+        """Periodically remove expired entries (run as a background task)"""
+        while True:
+            await asyncio.sleep(interval)
+            self.cleanup_expired()
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """Get value from cache if not expired (stale values included)"""
+        item = await self.get_item(key)
+        self._count_lookup(key, item)
+        if item is None:
+            return None
+        return item["value"]
+    
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None, stale_ttl: int = 0) -> None:
+        """Set value in cache with TTL.
+        
+        The value is fresh for `ttl` seconds and then served stale for
+        `stale_ttl` more seconds before it expires.
+        """
+        if ttl is None:
+            ttl = self.default_ttl
+        
+        stale_at = datetime.now() + timedelta(seconds=ttl)
+        await self.set_item(key, {
+            "value": value,
+            "stale_at": stale_at,
+            "expires_at": stale_at + timedelta(seconds=stale_ttl),
+            "created_at": datetime.now()
+        })
+        
+        logger.debug(f"Cache set for key '{key}' with TTL {ttl}s (+{stale_ttl}s stale)")
+    
+    async def get_or_set(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        stale_ttl: int = 0,
+        lock_timeout: Optional[float] = None
+    ) -> Tuple[Any, str]:
+        """Get a value, filling it with factory on a miss.
+        
+        Returns the value and its cache status: "HIT", "STALE" or "MISS".
+        Stale values are returned immediately while a background task
+        refreshes them, and concurrent fills for a key share one factory call.
+        """
+        item = await self.get_item(key)
+        status = self._count_lookup(key, item)
+        if status == "MISS":
+            return await self.flights.do(key, self._filler(key, factory, ttl, stale_ttl), lock_timeout), "MISS"
+        
+        if status == "STALE":
+            logger.debug(f"Cache key '{key}' is stale, refreshing in background")
+            self.refresh(key, factory, ttl, stale_ttl)
+        
+        return item["value"], status
+    
+    def refresh(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        stale_ttl: int = 0
+    ) -> "asyncio.Future[Any]":
+        """Refill a key in the background, joining any fill already in flight"""
+        call = self.flights.start(key, self._filler(key, factory, ttl, stale_ttl))
+        call.add_done_callback(lambda call: self._log_refresh_error(key, call))
+        return call
+    
+    def _filler(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[int],
+        stale_ttl: int
+    ) -> Callable[[], Awaitable[Any]]:
+        """Wrap factory so its result is stored under key"""
+        async def fill() -> Any:
+            started = time.perf_counter()
+            try:
+                value = await factory()
+            except BaseException as e:
+                self.counters.count(key, "fill_errors")
+                if is_gone(e):
+                    # Don't keep serving a stale copy of something deleted
+                    await self.delete(key)
+                raise
+            self.counters.fill(key, time.perf_counter() - started)
+            await self.set(key, value, ttl, stale_ttl)
+            return value
+        return fill
+    
+    def _count_lookup(self, key: str, item: Optional[Dict[str, Any]]) -> str:
+        """Count a lookup of key as a hit, stale hit or miss and return its cache status"""
+        if item is None:
+            self.counters.count(key, "misses")
+            return "MISS"
+        if datetime.now() > item["stale_at"]:
+            self.counters.count(key, "stale_hits")
+            return "STALE"
+        self.counters.count(key, "hits")
+        return "HIT"
+    
+    def _log_refresh_error(self, key: str, call: "asyncio.Future[Any]") -> None:
+        """Log a failed background refresh; the stale value stays in place unless it no longer exists"""
+        if call.cancelled() or call.exception() is None:
+            return
+        if is_gone(call.exception()):
+            logger.info(f"Cache key '{key}' no longer exists, removed it")
+        else:
+            logger.warning(f"Background refresh of cache key '{key}' failed: {call.exception()}")
+
+class SimpleCache(CacheBackend):
+    """Simple in-memory cache with TTL support and LRU eviction"""
+    
+    def __init__(
+        self,
+        default_ttl: int = 300,  # 5 minutes default TTL
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None
+    ):
+        super().__init__(default_ttl)
+        # Ordered from least to most recently used
+        self.cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    async def get_item(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get the cache entry (value and timestamps) if not expired"""
         if key not in self.cache:
             return None
         
@@ -22,51 +334,58 @@ class SimpleCache:
         # Check if expired
         if datetime.now() > item["expires_at"]:
             logger.debug(f"Cache key '{key}' expired, removing")
-            del self.cache[key]
+            self._remove(key)
+            self.expirations += 1
+            self.counters.count(key, "expirations")
             return None
         
+        self.cache.move_to_end(key)
         logger.debug(f"Cache hit for key '{key}'")
-        return item["value"]
+        return item
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
-        """Set value in cache with TTL"""
-        if ttl is None:
-            ttl = self.default_ttl
+    async def set_item(self, key: str, item: Dict[str, Any]) -> None:
+        """Store a cache entry, evicting least recently used entries if needed"""
+        size = approximate_size(item["value"])
+        if self.max_bytes is not None and size > self.max_bytes:
+            logger.warning(f"Cache value for key '{key}' ({size} bytes) exceeds the cache byte budget, not caching")
+            await self.delete(key)
+            return
         
-        expires_at = datetime.now() + timedelta(seconds=ttl)
+        if key in self.cache:
+            self._remove(key)
         
-        self.cache[key] = {
-            "value": value,
-            "expires_at": expires_at,
-            "created_at": datetime.now()
-        }
+        self.cache[key] = {**item, "size": size}
+        self.total_bytes += size
+        counters = self.counters.namespace(key)
+        counters["entries"] += 1
+        counters["bytes"] += size
         
-        logger.debug(f"Cache set for key '{key}' with TTL {ttl}s")
+        self._evict()
     
-    def delete(self, key: str) -> bool:
+    async def delete(self, key: str) -> bool:
         """Delete key from cache"""
         if key in self.cache:
-            del self.cache[key]
+            self._remove(key)
             logger.debug(f"Cache key '{key}' deleted")
             return True
         return False
     
-    def clear(self) -> None:
+    async def clear(self) -> None:
         """Clear all cache entries"""
         self.cache.clear()
+        self.total_bytes = 0
+        self.counters.clear_entries()
         logger.debug("Cache cleared")
     
-    def clear_pattern(self, pattern: str) -> int:
+    async def clear_pattern(self, pattern: str) -> int:
         """Clear cache entries matching a pattern (supports * wildcard)"""
-        import fnmatch
-        
         matching_keys = [
             key for key in self.cache.keys()
             if fnmatch.fnmatch(key, pattern)
         ]
         
         for key in matching_keys:
-            del self.cache[key]
+            self._remove(key)
         
         if matching_keys:
             logger.debug(f"Cleared {len(matching_keys)} cache entries matching pattern '{pattern}'")
@@ -82,26 +401,366 @@ class SimpleCache:
         ]
         
         for key in expired_keys:
-            del self.cache[key]
+            self._remove(key)
+            self.counters.count(key, "expirations")
+        self.expirations += len(expired_keys)
         
         if expired_keys:
             logger.debug(f"Cleaned up {len(expired_keys)} expired cache entries")
         
         return len(expired_keys)
     
-    def stats(self) -> Dict[str, Any]:
-        """Get cache statistics"""
-        now = datetime.now()
-        valid_entries = sum(
-            1 for item in self.cache.values()
-            if now <= item["expires_at"]
-        )
-        
+    async def stats(self) -> Dict[str, Any]:
+        """Get cache statistics (from running counters, without scanning entries)"""
         return {
+            "backend": "memory",
             "total_entries": len(self.cache),
-            "valid_entries": valid_entries,
-            "expired_entries": len(self.cache) - valid_entries
+            "total_bytes": self.total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            **self.counters.stats(entries=True)
         }
+    
+    def _remove(self, key: str) -> None:
+        """Remove an entry and release its size from the byte budget"""
+        item = self.cache.pop(key)
+        self.total_bytes -= item["size"]
+        counters = self.counters.namespace(key)
+        counters["entries"] -= 1
+        counters["bytes"] -= item["size"]
+    
+    def _evict(self) -> None:
+        """Evict least recently used entries until the cache is within its limits"""
+        while self.cache and (
+            (self.max_entries is not None and len(self.cache) > self.max_entries)
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            key = next(iter(self.cache))
+            self._remove(key)
+            self.evictions += 1
+            self.counters.count(key, "evictions")
+            logger.debug(f"Cache key '{key}' evicted")
+
+# Models a cache entry stored as JSON may hold, by name
+JSON_MODELS: Dict[str, type] = {model.__name__: model for model in (CachedResponse, PostSummary)}
+
+def encode_json_value(value: Any) -> Any:
+    """Tag the values JSON has no type for, so decode_entry can restore them"""
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode()}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, BaseModel) and JSON_MODELS.get(type(value).__name__) is type(value):
+        return {"__model__": type(value).__name__, "fields": value.model_dump()}
+    raise TypeError(f"Cannot store {type(value).__name__} in the cache")
+
+def decode_json_value(value: Dict[str, Any]) -> Any:
+    """Restore a value tagged by encode_json_value"""
+    if "__bytes__" in value:
+        return base64.b64decode(value["__bytes__"])
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    if "__model__" in value:
+        # Only known models, never arbitrary classes
+        return JSON_MODELS[value["__model__"]].model_validate(value["fields"])
+    return value
+
+def encode_entry(item: Dict[str, Any]) -> bytes:
+    """Serialize a cache entry as JSON"""
+    return json.dumps(item, default=encode_json_value, separators=(",", ":")).encode()
+
+def decode_entry(data: bytes) -> Dict[str, Any]:
+    """Deserialize a cache entry written by encode_entry"""
+    return json.loads(data, object_hook=decode_json_value)
+
+class RedisCache(CacheBackend):
+    """Cache stored in a Redis-protocol server, shared by all workers.
+    
+    Entries are stored as JSON, so reading them never runs code from the
+    server. Redis expires keys natively at the entry's hard TTL. Errors
+    talking to the server, and entries that can't be decoded (e.g. written
+    by an older version), are logged and treated as cache misses.
+    """
+    
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        client: Optional[Any] = None,
+        default_ttl: int = 300,
+        prefix: str = "blog:",
+        max_connections: int = 10
+    ):
+        super().__init__(default_ttl)
+        self.url = url
+        self.client = client
+        self.prefix = prefix
+        self.max_connections = max_connections
+    
+    def redis(self) -> Any:
+        """Return the pooled Redis client, creating it on first use"""
+        if self.client is None:
+            # Imported here so the redis package is only needed when configured
+            import redis.asyncio as redis
+            
+            self.client = redis.from_url(self.url, max_connections=self.max_connections)
+        return self.client
+    
+    async def connect(self) -> None:
+        """Create the connection pool and check that the server is reachable"""
+        try:
+            await self.redis().ping()
+            logger.info("Connected to Redis cache")
+        except Exception as e:
+            logger.warning(f"Redis cache is unreachable, continuing without it: {e}")
+    
+    async def close(self) -> None:
+        """Close the connection pool"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+    
+    async def get_item(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            data = await self.redis().get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Redis get for key '{key}' failed: {e}")
+            return None
+        
+        if data is None:
+            return None
+        
+        try:
+            item = decode_entry(data)
+        except Exception as e:
+            logger.warning(f"Redis entry for key '{key}' could not be decoded: {e}")
+            return None
+        # Redis drops the key at expires_at; this guards against clock skew
+        if datetime.now() > item["expires_at"]:
+            return None
+        return item
+    
+    async def set_item(self, key: str, item: Dict[str, Any]) -> None:
+        ttl_ms = int((item["expires_at"] - datetime.now()).total_seconds() * 1000)
+        try:
+            await self.redis().set(self.prefix + key, encode_entry(item), px=max(1, ttl_ms))
+        except Exception as e:
+            logger.warning(f"Redis set for key '{key}' failed: {e}")
+    
+    async def delete(self, key: str) -> bool:
+        try:
+            return await self.redis().delete(self.prefix + key) > 0
+        except Exception as e:
+            logger.warning(f"Redis delete for key '{key}' failed: {e}")
+            return False
+    
+    async def clear(self) -> None:
+        await self.clear_pattern("*")
+    
+    async def clear_pattern(self, pattern: str) -> int:
+        client = self.redis()
+        cleared = 0
+        try:
+            keys = [key async for key in client.scan_iter(match=self.prefix + pattern, count=500)]
+            # Delete in chunks to keep each command small
+            for i in range(0, len(keys), 500):
+                cleared += await client.delete(*keys[i:i + 500])
+        except Exception as e:
+            logger.warning(f"Redis clear for pattern '{pattern}' failed: {e}")
+        
+        if cleared:
+            logger.debug(f"Cleared {cleared} cache entries matching pattern '{pattern}'")
+        
+        return cleared
+    
+    async def stats(self) -> Dict[str, Any]:
+        try:
+            client = self.redis()
+            info = await client.info("memory")
+            return {
+                "backend": "redis",
+                "total_entries": await client.dbsize(),
+                "used_memory": info.get("used_memory"),
+                **self.counters.stats()
+            }
+        except Exception as e:
+            return {"backend": "redis", "error": str(e), **self.counters.stats()}
+
+class TieredCache(CacheBackend):
+    """Two-tier cache: an in-process L1 in front of a shared L2.
+    
+    Entries read from L2 are kept in L1 for at most `l1_ttl` seconds, so
+    invalidations made by other workers show up within that window.
+    """
+    
+    def __init__(self, l1: SimpleCache, l2: CacheBackend, l1_ttl: int = 30):
+        super().__init__(l2.default_ttl)
+        self.l1 = l1
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+        # Lookups are counted here and entries in L1, so share one set of counters
+        self.counters = l1.counters
+    
+    async def connect(self) -> None:
+        await self.l2.connect()
+    
+    async def close(self) -> None:
+        await self.l2.close()
+    
+    def cleanup_expired(self) -> int:
+        return self.l1.cleanup_expired()
+    
+    async def get_item(self, key: str) -> Optional[Dict[str, Any]]:
+        item = await self.l1.get_item(key)
+        if item is not None:
+            return item
+        
+        item = await self.l2.get_item(key)
+        if item is not None:
+            await self.l1.set_item(key, self._l1_item(item))
+        return item
+    
+    async def set_item(self, key: str, item: Dict[str, Any]) -> None:
+        await self.l2.set_item(key, item)
+        await self.l1.set_item(key, self._l1_item(item))
+    
+    async def delete(self, key: str) -> bool:
+        deleted_l1 = await self.l1.delete(key)
+        deleted_l2 = await self.l2.delete(key)
+        return deleted_l1 or deleted_l2
+    
+    async def clear(self) -> None:
+        await self.l1.clear()
+        await self.l2.clear()
+    
+    async def clear_pattern(self, pattern: str) -> int:
+        cleared_l1 = await self.l1.clear_pattern(pattern)
+        cleared_l2 = await self.l2.clear_pattern(pattern)
+        return max(cleared_l1, cleared_l2)
+    
+    async def stats(self) -> Dict[str, Any]:
+        counters = self.counters.stats(entries=True)
+        # The L2 backend's own counters stay empty, since lookups go through this cache
+        l1_stats, l2_stats = await self.l1.stats(), await self.l2.stats()
+        return {
+            "backend": "tiered",
+            "l1_ttl": self.l1_ttl,
+            **counters,
+            "l1": {key: value for key, value in l1_stats.items() if key not in counters},
+            "l2": {key: value for key, value in l2_stats.items() if key not in counters}
+        }
+    
+    def _l1_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of an entry that expires from L1 within l1_ttl"""
+        l1_expires_at = datetime.now() + timedelta(seconds=self.l1_ttl)
+        return {**item, "expires_at": min(item["expires_at"], l1_expires_at)}
+
+class NegativeCache:
+    """Slugs known not to exist, rejected before any cache or Notion work.
+    
+    Misses are remembered for `ttl` seconds in a bounded map of slug to
+    expiry time, kept apart from the main cache so they can't evict real
+    posts. The slugs of the last posts index seen (`known`) reject every
+    other slug for up to `known_ttl` seconds after it was loaded.
+    """
+    
+    def __init__(self, ttl: float = 60, max_entries: int = 10000, known_ttl: float = 300):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.known_ttl = known_ttl
+        self.misses: OrderedDict[str, float] = OrderedDict()
+        self.known: Optional[Container[str]] = None
+        self.known_at = 0.0
+        self.rejected = 0
+    
+    def is_missing(self, slug: str) -> bool:
+        """Check if a slug is known not to exist"""
+        now = time.monotonic()
+        expires_at = self.misses.get(slug)
+        if expires_at is not None:
+            if expires_at > now:
+                self.rejected += 1
+                return True
+            del self.misses[slug]
+        
+        if self.known is not None and now - self.known_at < self.known_ttl and slug not in self.known:
+            self.rejected += 1
+            return True
+        return False
+    
+    def add(self, slug: str) -> None:
+        """Remember a slug that was not found"""
+        self.misses[slug] = time.monotonic() + self.ttl
+        self.misses.move_to_end(slug)
+        while len(self.misses) > self.max_entries:
+            self.misses.popitem(last=False)
+    
+    def discard(self, slug: str) -> None:
+        """Forget a miss, e.g. because a page now has this slug"""
+        self.misses.pop(slug, None)
+    
+    def set_known(self, slugs: Container[str]) -> None:
+        """Use the slugs of a freshly loaded posts index"""
+        self.known = slugs
+        self.known_at = time.monotonic()
+        for slug in [slug for slug in self.misses if slug in slugs]:
+            del self.misses[slug]
+    
+    def clear(self) -> None:
+        """Forget every miss and the known slugs"""
+        self.misses.clear()
+        self.known = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get negative cache statistics"""
+        return {
+            "misses": len(self.misses),
+            "known_slugs": len(self.known) if self.known is not None else None,
+            "rejected": self.rejected,
+            "ttl": self.ttl
+        }
+
+def create_cache() -> CacheBackend:
+    """Create the cache backend selected by CACHE_BACKEND (memory, redis or tiered)"""
+    memory_cache = SimpleCache(
+        default_ttl=300,  # 5 minutes TTL
+        max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "1000")),
+        max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    )
+    
+    redis_url = os.getenv("REDIS_URL")
+    backend = os.getenv("CACHE_BACKEND", "tiered" if redis_url else "memory")
+    if backend == "memory":
+        return memory_cache
+    
+    if not redis_url:
+        raise ValueError(f"REDIS_URL environment variable is required for the '{backend}' cache backend")
+    redis_cache = RedisCache(
+        redis_url,
+        default_ttl=300,
+        prefix=os.getenv("REDIS_KEY_PREFIX", "blog:"),
+        max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "10"))
+    )
+    
+    if backend == "redis":
+        return redis_cache
+    if backend == "tiered":
+        return TieredCache(memory_cache, redis_cache, l1_ttl=int(os.getenv("CACHE_L1_TTL", "30")))
+    raise ValueError(f"Unknown CACHE_BACKEND '{backend}', expected memory, redis or tiered")
+
+# Seconds a request waits on another request's cache fill before giving up
+CACHE_LOCK_TIMEOUT = float(os.getenv("CACHE_LOCK_TIMEOUT", "30"))
+
+# Seconds an entry is served stale, while it is refreshed in the background,
+# after its TTL runs out
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", "86400"))
 
 # Global cache instance
-cache = SimpleCache(default_ttl=300)  # 5 minutes TTL
\ No newline at end of file
+cache = create_cache()
+
+# Unknown slugs, remembered for NEGATIVE_CACHE_TTL seconds
+negative_cache = NegativeCache(
+    ttl=float(os.getenv("NEGATIVE_CACHE_TTL", "60")),
+    max_entries=int(os.getenv("NEGATIVE_CACHE_MAX_ENTRIES", "10000"))
+)
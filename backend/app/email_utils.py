@@ -1,37 +1,220 @@
+import asyncio
+import logging
 import smtplib
 import os
+from contextlib import suppress
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from typing import Any, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def send_contact_email(name: str, email: str, message: str):
-    sender_email = os.getenv("SENDER_EMAIL")
-    receiver_email = os.getenv("RECEIVER_EMAIL")
-    google_email_api_pass = os.getenv("GOOGLE_EMAIL_API_PASS")
+logger = logging.getLogger(__name__)
 
-    if not all([sender_email, receiver_email, google_email_api_pass]):
+def get_email_config() -> Dict[str, str]:
+    """Get the contact email settings from environment"""
+    config = {
+        "sender_email": os.getenv("SENDER_EMAIL"),
+        "receiver_email": os.getenv("RECEIVER_EMAIL"),
+        "password": os.getenv("GOOGLE_EMAIL_API_PASS"),
+    }
+    required = ["sender_email", "receiver_email"]
+    if not os.getenv("EMAIL_HOST"):
+        # Only a custom (e.g. local) SMTP server may not need a login
+        required.append("password")
+
+    if not all(config[key] for key in required):
         raise ValueError("Missing email configuration in environment variables")
+    return config
 
+def build_contact_email(name: str, email: str, message: str, config: Dict[str, str]) -> MIMEMultipart:
+    """Build the email for a contact form submission"""
     msg = MIMEMultipart()
-    msg["From"] = sender_email
-    msg["To"] = receiver_email
+    msg["From"] = config["sender_email"]
+    msg["To"] = config["receiver_email"]
     msg["Reply-To"] = email
     msg["Subject"] = f"New contact form submission from {name}"
 
     body = f"Name: {name}\nEmail: {email}\n\nMessage:\n{message}"
     msg.attach(MIMEText(body, "plain"))
+    return msg
+
+class EmailSender:
+    """Sends queued emails from a background worker.
+
+    The worker keeps one authenticated SMTP session open while there is
+    mail to send and sends everything queued during a burst over it. The
+    session is closed after `idle_timeout` seconds without mail. Blocking
+    smtplib calls run in a thread so the event loop is never blocked.
+    Failed emails are retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        host: str = "smtp.gmail.com",
+        port: int = 587,
+        starttls: bool = True,
+        idle_timeout: float = 60,
+        batch_size: int = 20,
+        max_attempts: int = 3
+    ):
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.idle_timeout = idle_timeout
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.smtp: Optional[smtplib.SMTP] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker: Optional[asyncio.Task] = None
+        # Failed emails waiting out their backoff, by id, with their retry timers
+        self.retrying: Dict[int, Tuple[asyncio.TimerHandle, Dict[str, Any]]] = {}
+        self.sent = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        """Start the background worker if it is not running"""
+        if self.worker is None or self.worker.done():
+            if self.queue is None:
+                self.queue = asyncio.Queue()
+            self.worker = asyncio.create_task(self.run())
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Send what is still queued or waiting to be retried (for at most `timeout` seconds) and stop the worker"""
+        if self.worker is not None:
+            # Don't wait out the backoff of pending retries
+            for handle, email in list(self.retrying.values()):
+                handle.cancel()
+                self.retry(email)
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self.queue.join(), timeout)
+            self.worker.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.worker
+            self.worker = None
+
+            # Whatever is left (still queued, or failed again) is lost
+            for handle, _ in self.retrying.values():
+                handle.cancel()
+            lost = self.queue.qsize() + len(self.retrying)
+            if lost:
+                self.failed += lost
+                logger.error(f"Dropping {lost} unsent emails on shutdown")
+            self.retrying.clear()
+            self.queue = None
+        await asyncio.to_thread(self.disconnect)
+
+    def enqueue(self, sender: str, recipient: str, msg: MIMEMultipart) -> None:
+        """Queue an email; returns immediately"""
+        self.start()
+        self.queue.put_nowait({"sender": sender, "recipient": recipient, "text": msg.as_string(), "attempts": 0})
+
+    async def run(self) -> None:
+        """Send queued emails in batches until cancelled"""
+        while True:
+            try:
+                email = await asyncio.wait_for(self.queue.get(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                # Nothing to send for a while, don't hold the connection open
+                await asyncio.to_thread(self.disconnect)
+                continue
+
+            batch = [email]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            try:
+                failed = await asyncio.to_thread(self.send_batch, batch)
+                for email in failed:
+                    email["attempts"] += 1
+                    if email["attempts"] < self.max_attempts:
+                        # Retry later, backing off with each attempt
+                        handle = asyncio.get_running_loop().call_later(2 ** email["attempts"], self.retry, email)
+                        self.retrying[id(email)] = (handle, email)
+                    else:
+                        self.failed += 1
+                        logger.error(f"Giving up on email to {email['recipient']} after {email['attempts']} attempts")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def retry(self, email: Dict[str, Any]) -> None:
+        """Queue a failed email again"""
+        self.retrying.pop(id(email), None)
+        self.queue.put_nowait(email)
+
+    def connect(self) -> smtplib.SMTP:
+        """Return the open SMTP session, (re)connecting and logging in if needed"""
+        if self.smtp is not None:
+            try:
+                self.smtp.noop()
+                return self.smtp
+            except (smtplib.SMTPException, OSError):
+                self.disconnect()
+
+        smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            config = get_email_config()
+            if config["password"]:
+                smtp.login(config["sender_email"], config["password"])
+        except Exception:
+            smtp.close()
+            raise
+        self.smtp = smtp
+        return smtp
+
+    def disconnect(self) -> None:
+        """Close the SMTP session, if open"""
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except smtplib.SMTPException:
+                self.smtp.close()
+            except OSError:
+                pass
+            self.smtp = None
+
+    def send_batch(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Send emails over one session; returns the ones that failed"""
+        failed = []
+        for email in batch:
+            try:
+                self.connect().sendmail(email["sender"], email["recipient"], email["text"])
+                self.sent += 1
+            except (smtplib.SMTPException, OSError, ValueError) as e:
+                logger.error(f"Failed to send email to {email['recipient']}: {e}")
+                # Start the next attempt from a fresh connection
+                self.disconnect()
+                failed.append(email)
+        if batch:
+            logger.info(f"Sent {len(batch) - len(failed)} of {len(batch)} queued emails")
+        return failed
+
+    def stats(self) -> Dict[str, int]:
+        """Get email queue statistics"""
+        return {
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "retrying": len(self.retrying),
+            "sent": self.sent,
+            "failed": self.failed,
+            "connected": self.smtp is not None
+        }
+
+# Global sender
+email_sender = EmailSender(
+    host=os.getenv("EMAIL_HOST", "smtp.gmail.com"),
+    port=int(os.getenv("EMAIL_PORT", "587")),
+    starttls=os.getenv("EMAIL_STARTTLS", "true").lower() == "true",
+    idle_timeout=float(os.getenv("EMAIL_IDLE_TIMEOUT", "60")),
+    batch_size=int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+)
 
-    try:
-        server = smtplib.SMTP("smtp.gmail.com", 587)
-        server.starttls()
-        server.login(sender_email, google_email_api_pass)
-        text = msg.as_string()
-        server.sendmail(sender_email, receiver_email, text)
-        server.quit()
-    except Exception as e:
-        # You might want to log this error
-        print(f"Failed to send email: {e}")
-        raise
+def queue_contact_email(name: str, email: str, message: str) -> None:
+    """Queue a contact form email for the background sender"""
+    config = get_email_config()
+    msg = build_contact_email(name, email, message, config)
+    email_sender.enqueue(config["sender_email"], config["receiver_email"], msg)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Export the blog as a static snapshot of pre-rendered JSON responses.
+
+Usage: python -m app.export [--out DIR]
+
+Writes `posts.json` and `posts/{slug}.json` (each with a `.json.gz`
+copy) to DIR, or to SNAPSHOT_DIR if no directory is given. With
+CONTENT_STORE_PATH set, re-running the export only re-renders the posts
+edited since the last run.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from typing import Any, Dict
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import PostSummary, PostDetail, PostsResponse
+from app.notion.client import get_max_concurrency, close_async_notion
+from app.responses import render_cached_response
+from app.snapshot import Snapshot
+from app.sync import content_sync, earliest_expiry
+
+async def export_snapshot(directory: str) -> Dict[str, Any]:
+    """Render every published post into `directory`"""
+    snapshot = Snapshot(directory)
+    content_sync.load()
+    posts = await content_sync.sync()
+    
+    # The posts list, without a last edit time: removing a post changes it
+    # without moving any remaining page's, so its mtime is the export time
+    summaries = [PostSummary(**parsed_props) for _, parsed_props in posts]
+    snapshot.write("posts", render_cached_response(
+        PostsResponse(posts=summaries, total=len(summaries)),
+        expiry_time=earliest_expiry(parsed_props.get("expiry_time") for _, parsed_props in posts)
+    ))
+    
+    # Render the posts concurrently, a few pages at a time
+    semaphore = asyncio.Semaphore(get_max_concurrency())
+    
+    async def export_post(page: Dict[str, Any]) -> None:
+        async with semaphore:
+            parsed_props = await content_sync.render(page)
+        post_detail = PostDetail(**parsed_props)
+        snapshot.write(
+            f"posts/{post_detail.slug}",
+            render_cached_response(post_detail, post_detail.last_edited_time, parsed_props.get("expiry_time"))
+        )
+    
+    await asyncio.gather(*(export_post(page) for page, _ in posts))
+    removed = snapshot.prune_posts(summary.slug for summary in summaries)
+    
+    return {"directory": snapshot.directory, "posts": len(summaries), "removed": removed}
+
+async def main(directory: str) -> None:
+    """Run the export and release the Notion client and content store"""
+    try:
+        result = await export_snapshot(directory)
+        print(f"Exported {result['posts']} posts to {result['directory']} (removed {result['removed']})")
+    finally:
+        await close_async_notion()
+        if content_sync.store is not None:
+            content_sync.store.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the blog as a static JSON snapshot")
+    parser.add_argument("--out", default=os.getenv("SNAPSHOT_DIR", "snapshot"), help="snapshot directory")
+    asyncio.run(main(parser.parse_args().out))
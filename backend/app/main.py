@@ -1,22 +1,131 @@
-from fastapi import FastAPI, HTTPException, Response
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+import asyncio
+from datetime import datetime
+from contextlib import asynccontextmanager, suppress
+from typing import Any, Dict, List, Optional, Tuple
 import logging
+import math
 import os
+import time
+import uuid
 from dotenv import load_dotenv
-from app.models import PostSummary, PostDetail, PostsResponse, ErrorResponse, ContactForm
-from app.notion.parser import query_database, parse_page_properties, get_page_content
-from app.cache import cache
-from app.email_utils import send_contact_email
+from notion_client import APIErrorCode, APIResponseError
+from app.models import PostSummary, PostDetail, PostsResponse, SearchResponse, ErrorResponse, ContactForm, CachedResponse
+from app.notion.parser import get_page, parse_page_summary, render_memo
+from app.cache import cache, negative_cache, CACHE_LOCK_TIMEOUT, CACHE_STALE_TTL
+from app.notion.client import get_async_notion, close_async_notion, get_database_id, get_max_concurrency
+from app.email_utils import email_sender, queue_contact_email
+from app.ratelimit import RateLimitExceeded, parse_rate_limit, client_address
+from app.metrics import METRICS_ENABLED, request_duration, start_trace, server_timing, render_metrics
+from app.responses import render_cached_response, cached_json_response
+from app.sync import content_sync, earliest_expiry, is_expired
+from app.snapshot import snapshot
+from app.search import search_index
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the shared Notion client, cache connections, sweeper and email worker on startup, stop them on shutdown"""
+    if os.getenv("NOTION_API_KEY"):
+        get_async_notion()
+    await cache.connect()
+    await restore_content()
+    sweeper = asyncio.create_task(
+        cache.sweep_expired(float(os.getenv("CACHE_SWEEP_INTERVAL", "60")))
+    )
+    if CACHE_WARMUP:
+        # /ready reports 503 until this first warm-up finishes
+        warmup["ready"] = False
+        start_warmup()
+    email_sender.start()
+    yield
+    await email_sender.stop()
+    for task in (sweeper, warmup_task):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    await cache.close()
+    await close_async_notion()
+    if content_sync.store is not None:
+        content_sync.store.close()
+
+
 app = FastAPI(
     title="Blog API",
     description="A blog API powered by Notion CMS",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Per-client rate limits ("requests/seconds") for the endpoints that can
+# reach Notion or send email; list requests are served from the cache
+rate_limiters = {
+    "post": parse_rate_limit("RATE_LIMIT_POST", "30/10"),
+    "contact": parse_rate_limit("RATE_LIMIT_CONTACT", "3/60"),
+    "cache": parse_rate_limit("RATE_LIMIT_CACHE", "10/60"),
+    "search": parse_rate_limit("RATE_LIMIT_SEARCH", "30/10"),
+}
+
+
+def rate_limit_group(request: Request) -> Optional[str]:
+    """Name of the rate limit a request counts against, if any"""
+    path = request.url.path
+    if path.startswith("/posts/"):
+        return "post"
+    if path == "/contact" and request.method == "POST":
+        return "contact"
+    if path.startswith("/cache/"):
+        return "cache"
+    if path == "/search":
+        return "search"
+    return None
+
+
+# Registered before CORS so rate limited responses still get CORS headers
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    """Reject requests over their client's rate limit with 429"""
+    limiter = rate_limiters.get(rate_limit_group(request))
+    if limiter is not None:
+        retry_after = limiter.check(client_address(request))
+        if retry_after > 0:
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests"},
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+    return await call_next(request)
+
+
+if METRICS_ENABLED:
+    @app.middleware("http")
+    async def trace_request(request: Request, call_next):
+        """Time the request and report its Notion call and render stage totals in Server-Timing"""
+        trace = start_trace()
+        started = time.perf_counter()
+        response = await call_next(request)
+        elapsed = time.perf_counter() - started
+        
+        # Label by route template, not path, to keep one series per endpoint
+        route = request.scope.get("route")
+        request_duration.observe(f"{request.method} {route.path if route else 'unmatched'}", elapsed)
+        response.headers["Server-Timing"] = server_timing(trace, elapsed)
+        return response
+
+
+def upstream_busy(e: RateLimitExceeded) -> HTTPException:
+    """503 for a request shed by the Notion upstream budget"""
+    return HTTPException(
+        status_code=503,
+        detail="Notion request budget exhausted, try again shortly",
+        headers={"Retry-After": str(math.ceil(e.retry_after))}
+    )
+
 # Configure CORS
 origins_str = os.getenv("CORS_ALLOWED_ORIGINS", "http://localhost:3000")
 allowed_origins = [origin.strip() for origin in origins_str.split(",")]
@@ -33,61 +142,439 @@ app.add_middleware(
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Fresh cache lifetimes in seconds; entries are then served stale for
+# CACHE_STALE_TTL more seconds while they are refreshed in the background
+POSTS_LIST_TTL = 300
+POST_TTL = 600  # longer than list since content is more expensive
+
+# Optional background warm-up of the posts list and the newest
+# CACHE_WARMUP_POSTS posts (0 for all) on startup and after a full
+# invalidation
+CACHE_WARMUP = os.getenv("CACHE_WARMUP", "false").lower() == "true"
+CACHE_WARMUP_POSTS = int(os.getenv("CACHE_WARMUP_POSTS", "0"))
+warmup: Dict[str, Any] = {
+    "ready": True,
+    "running": False,
+    "warmed_posts": 0,
+    "failed_posts": 0,
+    "started_at": None,
+    "finished_at": None,
+    "error": None
+}
+warmup_task: Optional[asyncio.Task] = None
+
+
+def cache_control(ttl: int) -> str:
+    """Cache-Control header value matching the server-side cache lifetimes"""
+    return f"public, max-age={ttl}, stale-while-revalidate={CACHE_STALE_TTL}"
+
+
+# Notion webhook events that change a page
+PAGE_EVENTS = [
+    "page.created",
+    "page.updated",
+    "page.deleted",
+    "page.undeleted",
+    "page.content_updated",
+    "page.properties_updated",
+]
+
+
+# Held while the posts index is read, patched and stored, so concurrent
+# webhook events and builds don't overwrite each other's changes
+posts_index_lock = asyncio.Lock()
+
+
+async def build_posts_index() -> Tuple[CachedResponse, Dict[str, Any]]:
+    """Sync pages edited since the last build and cache the posts list together with its slug index"""
+    # Only new or edited pages are re-parsed
+    await content_sync.sync()
+    async with posts_index_lock:
+        # Includes pages webhook events recorded while the sync was running
+        index = index_posts(content_sync.posts())
+        return await store_posts_index(index), index
+
+
+def index_posts(posts: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> Dict[str, Any]:
+    """Build PostSummary models and index the pages by slug, and the slugs by page id"""
+    index = {"posts": [], "slugs": {}, "ids": {}}
+    for page, parsed_props in posts:
+        index["posts"].append(PostSummary(**parsed_props))
+        index["slugs"][parsed_props["slug"]] = page
+        index["ids"][page["id"]] = parsed_props["slug"]
+    return index
+
+
+async def store_posts_index(index: Dict[str, Any], ttl: int = POSTS_LIST_TTL) -> CachedResponse:
+    """Cache the posts index together with the serialized posts list"""
+    # No Last-Modified: deleting or unpublishing a post changes the list
+    # without moving any remaining page's edit time, so only the ETag is
+    # a safe validator
+    posts_list = render_cached_response(
+        PostsResponse(posts=index["posts"], total=len(index["posts"])),
+        expiry_time=earliest_expiry(content_sync.summaries.get(post.id, {}).get("expiry_time") for post in index["posts"])
+    )
+    # Tells apart every stored index, even once it has been through Redis
+    index["version"] = uuid.uuid4().hex
+    
+    await cache.set("posts_list", posts_list, ttl=ttl, stale_ttl=CACHE_STALE_TTL)
+    await cache.set("posts_index", index, ttl=ttl, stale_ttl=CACHE_STALE_TTL)
+    negative_cache.set_known(index["slugs"])
+    index_search(index)
+    if snapshot is not None:
+        snapshot.write("posts", posts_list)
+    
+    return posts_list
+
+
+# Version of the posts index the search index was last brought in line with
+searched_version: Optional[str] = None
+
+
+def index_search(index: Dict[str, Any]) -> None:
+    """Bring the search index in line with the posts index.
+    
+    Only posts whose page changed are re-indexed. Content is indexed once
+    a post has been rendered by this process (or restored from the content
+    store); until then its title and excerpt are searchable.
+    """
+    global searched_version
+    for post in index["posts"]:
+        version = index["slugs"][post.slug].get("last_edited_time")
+        rendered = content_sync.rendered.get(post.id)
+        content = None
+        if rendered is not None and rendered["last_edited_time"] == version:
+            content = rendered["props"]["content"]
+        search_index.add(post.id, post.model_dump(), version, content)
+    search_index.retain(index["ids"])
+    searched_version = index.get("version")
+
+
+async def load_posts_index() -> Tuple[CachedResponse, Dict[str, Any]]:
+    """Build the posts list and slug index, sharing one build between concurrent callers"""
+    return await cache.flights.do("posts_build", build_posts_index, timeout=CACHE_LOCK_TIMEOUT)
+
+
+async def get_posts_index() -> Dict[str, Any]:
+    """Get the posts index, rebuilding it if it is not cached.
+    
+    `index["posts"]` holds the post summaries in list order,
+    `index["slugs"]` maps slugs to Notion pages and `index["ids"]` maps
+    page ids back to slugs.
+    """
+    async def fill() -> Dict[str, Any]:
+        logger.info("Building posts index from Notion database")
+        _, index = await load_posts_index()
+        return index
+    
+    index, _ = await cache.get_or_set(
+        "posts_index",
+        fill,
+        ttl=POSTS_LIST_TTL,
+        stale_ttl=CACHE_STALE_TTL,
+        lock_timeout=CACHE_LOCK_TIMEOUT
+    )
+    negative_cache.set_known(index["slugs"])
+    return index
+
+
+async def build_post_detail(slug: str) -> PostDetail:
+    """Fetch and render a single post from Notion"""
+    logger.info(f"Fetching post with slug: {slug}")
+    
+    # Resolve the slug through the index (one database query when cold)
+    target_page = (await get_posts_index())["slugs"].get(slug)
+    
+    if not target_page:
+        logger.warning(f"Post not found with slug: {slug}")
+        negative_cache.add(slug)
+        raise HTTPException(
+            status_code=404,
+            detail=f"Post with slug '{slug}' not found"
+        )
+    
+    # Parse page properties (the only block fetch for this request,
+    # skipped if the page is unchanged since it was last rendered)
+    parsed_props = await content_sync.render(target_page)
+    search_index.add(
+        target_page["id"],
+        PostSummary(**parsed_props).model_dump(),
+        target_page.get("last_edited_time"),
+        parsed_props["content"]
+    )
+    
+    logger.info(f"Successfully fetched post: {parsed_props['title']}")
+    
+    return PostDetail(**parsed_props)
+
+
+async def restore_content() -> None:
+    """Warm the cache from the content store saved by a previous process.
+    
+    Restored entries are stored already stale, so they are served at once
+    and validated against Notion in the background on first use. Entries
+    another worker already cached (e.g. in Redis) are left alone.
+    """
+    try:
+        posts = content_sync.load()
+    except Exception as e:
+        # A missing or unreadable store only means a cold start
+        logger.error(f"Error loading the content store: {str(e)}")
+        return
+    if not posts:
+        return
+    
+    index = index_posts(posts)
+    if await cache.get_item("posts_index") is None:
+        await store_posts_index(index, ttl=0)
+    else:
+        index_search(index)
+    
+    restored = 0
+    for page_id, slug in index["ids"].items():
+        rendered = content_sync.rendered.get(page_id)
+        if rendered is None or is_expired(rendered["props"].get("expiry_time")) or await cache.get_item(f"post_{slug}") is not None:
+            continue
+        post_detail = PostDetail(**rendered["props"])
+        post = render_cached_response(post_detail, post_detail.last_edited_time, rendered["props"].get("expiry_time"))
+        await cache.set(f"post_{slug}", post, ttl=0, stale_ttl=CACHE_STALE_TTL)
+        restored += 1
+    
+    logger.info(f"Restored {len(index['posts'])} posts ({restored} rendered) from the content store")
+
+
+async def render_post(slug: str) -> CachedResponse:
+    """Fetch a post from Notion and serialize it for the cache (and the snapshot)"""
+    post_detail = await build_post_detail(slug)
+    rendered = content_sync.rendered.get(post_detail.id)
+    expiry_time = rendered["props"].get("expiry_time") if rendered is not None else None
+    post = render_cached_response(post_detail, post_detail.last_edited_time, expiry_time)
+    if snapshot is not None:
+        snapshot.write(f"posts/{slug}", post)
+    return post
+
+
+async def warm_cache() -> None:
+    """Fill the posts list and the newest posts, a few at a time"""
+    warmup.update(
+        running=True,
+        warmed_posts=0,
+        failed_posts=0,
+        started_at=datetime.now().isoformat(),
+        finished_at=None,
+        error=None
+    )
+    try:
+        # Fills posts_list together with the index
+        index = await get_posts_index()
+        posts = index["posts"][:CACHE_WARMUP_POSTS] if CACHE_WARMUP_POSTS > 0 else index["posts"]
+        semaphore = asyncio.Semaphore(get_max_concurrency())
+        
+        async def warm_post(slug: str) -> None:
+            async with semaphore:
+                try:
+                    await cache.get_or_set(
+                        f"post_{slug}",
+                        lambda: render_post(slug),
+                        ttl=POST_TTL,
+                        stale_ttl=CACHE_STALE_TTL,
+                        lock_timeout=CACHE_LOCK_TIMEOUT
+                    )
+                    warmup["warmed_posts"] += 1
+                except Exception as e:
+                    warmup["failed_posts"] += 1
+                    logger.error(f"Error warming post {slug}: {str(e)}")
+        
+        await asyncio.gather(*(warm_post(post.slug) for post in posts))
+        logger.info(f"Cache warm-up finished: {warmup['warmed_posts']} posts warmed, {warmup['failed_posts']} failed")
+    except Exception as e:
+        warmup["error"] = str(e)
+        logger.error(f"Error warming the cache: {str(e)}")
+    finally:
+        # Even a failed warm-up must not hold traffic forever
+        warmup.update(ready=True, running=False, finished_at=datetime.now().isoformat())
+
+
+def start_warmup() -> None:
+    """Start warming the cache in the background, replacing a warm-up already running"""
+    global warmup_task
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    warmup_task = asyncio.create_task(warm_cache())
+
+
+def in_blog_database(page: Dict[str, Any]) -> bool:
+    """Check that a page belongs to the blog's Notion database"""
+    database_id = (page.get("parent") or {}).get("database_id") or ""
+    # Notion returns dashed ids, the configured one may not have dashes
+    return database_id.replace("-", "") == get_database_id().replace("-", "")
+
+
+async def apply_page_event(event_type: str, page_id: Optional[str]) -> Dict[str, Any]:
+    """Update the cached list and index for one changed page.
+    
+    Only the affected post is invalidated (and re-rendered in the
+    background); every other cached post stays hot.
+    """
+    index = await cache.get("posts_index")
+    # Slug the page was last synced under, in case building the index
+    # below already picks up a new one
+    synced_slug = content_sync.summaries.get(page_id, {}).get("slug") if page_id else None
+    if index is None and page_id and snapshot is not None:
+        # Snapshot reads skip the cache, so the index is usually cold; build
+        # it, since a full invalidation would leave the snapshot files alone
+        try:
+            _, index = await load_posts_index()
+        except Exception as e:
+            logger.error(f"Error building the posts index for page {page_id}: {str(e)}")
+    if index is None or not page_id:
+        # Nothing consistent to patch, fall back to a full invalidation
+        if page_id and event_type == "page.deleted":
+            content_sync.remove_page(page_id)
+            await content_sync.flush()
+        else:
+            # The page may have been unpublished or moved, which an
+            # incremental sync would not notice
+            await content_sync.reset()
+        await cache.clear_pattern("posts_*")
+        await cache.clear_pattern("post_*")
+        if CACHE_WARMUP:
+            start_warmup()
+        return {"invalidated": "all"}
+    
+    old_slug = index["ids"].get(page_id)
+    page = None
+    if event_type != "page.deleted":
+        try:
+            page = await get_page(page_id)
+        except Exception as e:
+            if not (isinstance(e, APIResponseError) and e.code == APIErrorCode.ObjectNotFound):
+                # Leave the list alone; the post is rendered again on its next request
+                logger.warning(f"Could not retrieve page {page_id}, invalidating its post only: {str(e)}")
+                if old_slug is None:
+                    return {"invalidated": []}
+                await cache.delete(f"post_{old_slug}")
+                if snapshot is not None:
+                    snapshot.delete(f"posts/{old_slug}")
+                return {"invalidated": [old_slug]}
+            # Permanently deleted, or no longer shared with the integration
+            logger.info(f"Page {page_id} no longer exists, removing its post")
+    
+    if page is not None and not in_blog_database(page):
+        if old_slug is None:
+            logger.info(f"Ignoring page {page_id} from another database")
+            return {"invalidated": []}
+        # Moved out of the blog database
+        page = None
+    
+    parsed_props = await parse_page_summary(page) if page is not None else None
+    
+    async with posts_index_lock:
+        if page is not None:
+            # With its summary, so a build waiting on the lock still lists it
+            content_sync.update_page(page, parsed_props)
+            if page.get("archived") or page.get("in_trash") or not parsed_props["published"]:
+                page = None
+        if page is None:
+            content_sync.remove_page(page_id)
+        
+        # Patch the index as stored now: another event or build may have
+        # replaced it while Notion was being queried
+        current = await cache.get("posts_index")
+        stored_slug = None
+        new_slug = parsed_props["slug"] if page is not None else None
+        if current is not None:
+            stored_slug = current["ids"].get(page_id)
+            slugs = dict(current["slugs"])
+            ids = dict(current["ids"])
+            posts = [post for post in current["posts"] if post.id != page_id]
+            if stored_slug is not None:
+                slugs.pop(stored_slug, None)
+                ids.pop(page_id, None)
+            
+            if page is not None:
+                slugs[new_slug] = page
+                ids[page_id] = new_slug
+                posts.append(PostSummary(**parsed_props))
+                # Keep the database sort order (Date, descending)
+                posts.sort(key=lambda post: post.date, reverse=True)
+            
+            await store_posts_index({"posts": posts, "slugs": slugs, "ids": ids})
+        # Otherwise it was invalidated meanwhile, and the next build picks
+        # the page up from content_sync
+    await content_sync.flush()
+    
+    if new_slug is not None:
+        negative_cache.discard(new_slug)
+    
+    # Invalidate only the affected post, then re-render it eagerly
+    invalidated = {old_slug, stored_slug, synced_slug, new_slug} - {None}
+    for slug in invalidated:
+        await cache.delete(f"post_{slug}")
+        if snapshot is not None and slug != new_slug:
+            # The new post's file is replaced once it is re-rendered
+            snapshot.delete(f"posts/{slug}")
+    if new_slug is not None:
+        cache.refresh(f"post_{new_slug}", lambda: render_post(new_slug), ttl=POST_TTL, stale_ttl=CACHE_STALE_TTL)
+    
+    return {"invalidated": sorted(invalidated)}
+
 
 @app.get("/")
 def index():
     return {"message": "Blog API", "status": "running", "version": "1.0.0"}
 
 
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 until the startup cache warm-up has finished"""
+    status_code = 200 if warmup["ready"] else 503
+    return JSONResponse(
+        status_code=status_code,
+        content={"status": "ready" if warmup["ready"] else "warming", "warmup": warmup}
+    )
+
+
 @app.get("/posts", response_model=PostsResponse)
-async def get_posts(response: Response):
+async def get_posts(request: Request):
     """Get all published blog posts"""
     try:
-        # Check cache first
-        cache_key = "posts_list"
-        cached_posts = cache.get(cache_key)
-        
-        if cached_posts:
-            logger.info("Returning cached posts list")
-            # Set cache headers for cached responses
-            response.headers["Cache-Control"] = "public, max-age=300"
-            response.headers["X-Cache-Status"] = "HIT"
-            return cached_posts
-        
-        logger.info("Fetching posts from Notion database")
-        
-        # Query Notion database for published posts
-        pages = query_database()
+        # Serve the exported snapshot without touching the cache or Notion,
+        # unless its signed file URLs are about to expire
+        posts_list = snapshot.read("posts") if snapshot is not None else None
+        if posts_list is not None and not is_expired(posts_list.expiry_time):
+            return cached_json_response(request, posts_list, {
+                "Cache-Control": cache_control(POSTS_LIST_TTL),
+                "X-Cache-Status": "SNAPSHOT"
+            })
         
-        # Parse page properties into PostSummary models
-        posts = []
-        for page in pages:
-            parsed_props = parse_page_properties(page)
-            
-            post_summary = PostSummary(
-                id=parsed_props["id"],
-                title=parsed_props["title"],
-                slug=parsed_props["slug"],
-                date=parsed_props["date"],
-                excerpt=parsed_props["excerpt"],
-                cover=parsed_props["cover"],
-                published=parsed_props["published"]
-            )
-            posts.append(post_summary)
-        
-        response_data = PostsResponse(posts=posts, total=len(posts))
-        
-        # Cache the response for 5 minutes
-        cache.set(cache_key, response_data, ttl=300)
+        async def fill() -> CachedResponse:
+            logger.info("Fetching posts from Notion database")
+            posts_list, index = await load_posts_index()
+            logger.info(f"Successfully fetched and cached {len(index['posts'])} posts")
+            return posts_list
         
-        # Set cache headers for fresh responses
-        response.headers["Cache-Control"] = "public, max-age=300"
-        response.headers["X-Cache-Status"] = "MISS"
+        # Check cache first; concurrent misses share a single Notion fetch
+        # and stale entries are served while they refresh in the background
+        posts_list, cache_status = await cache.get_or_set(
+            "posts_list",
+            fill,
+            ttl=POSTS_LIST_TTL,
+            stale_ttl=CACHE_STALE_TTL,
+            lock_timeout=CACHE_LOCK_TIMEOUT
+        )
         
-        logger.info(f"Successfully fetched and cached {len(posts)} posts")
+        if cache_status != "MISS":
+            logger.info(f"Returning cached posts list ({cache_status})")
         
-        return response_data
+        # Send the pre-serialized body with cache headers
+        return cached_json_response(request, posts_list, {
+            "Cache-Control": cache_control(POSTS_LIST_TTL),
+            "X-Cache-Status": cache_status
+        })
         
+    except RateLimitExceeded as e:
+        raise upstream_busy(e)
     except Exception as e:
         logger.error(f"Error fetching posts: {str(e)}")
         raise HTTPException(
@@ -97,82 +584,49 @@ async def get_posts(response: Response):
 
 
 @app.get("/posts/{slug}", response_model=PostDetail)
-async def get_post(slug: str, response: Response):
+async def get_post(slug: str, request: Request):
     """Get a specific blog post by slug"""
+    # Reject slugs known not to exist before any cache or Notion work
+    if negative_cache.is_missing(slug):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Post with slug '{slug}' not found",
+            headers={"X-Cache-Status": "NEGATIVE"}
+        )
+    
     try:
-        # Check cache first
-        cache_key = f"post_{slug}"
-        cached_post = cache.get(cache_key)
-        
-        if cached_post:
-            logger.info(f"Returning cached post: {slug}")
-            # Set cache headers for cached responses
-            response.headers["Cache-Control"] = "public, max-age=600"
-            response.headers["X-Cache-Status"] = "HIT"
-            return cached_post
-        
-        logger.info(f"Fetching post with slug: {slug}")
-        
-        # Query Notion database for published posts
-        pages = query_database()
-        
-        # Find the page with matching slug
-        target_page = None
-        for page in pages:
-            parsed_props = parse_page_properties(page)
-            if parsed_props["slug"] == slug:
-                target_page = page
-                break
-        
-        if not target_page:
-            logger.warning(f"Post not found with slug: {slug}")
-            raise HTTPException(
-                status_code=404,
-                detail=f"Post with slug '{slug}' not found"
-            )
-        
-        # Parse page properties
-        parsed_props = parse_page_properties(target_page)
+        # Serve the exported snapshot without touching the cache or Notion,
+        # unless its signed file URLs are about to expire
+        post = snapshot.read(f"posts/{slug}") if snapshot is not None else None
+        if post is not None and not is_expired(post.expiry_time):
+            return cached_json_response(request, post, {
+                "Cache-Control": cache_control(POST_TTL),
+                "X-Cache-Status": "SNAPSHOT"
+            })
         
-        # Create PostDetail model
-        post_detail = PostDetail(
-            id=parsed_props["id"],
-            title=parsed_props["title"],
-            slug=parsed_props["slug"],
-            date=parsed_props["date"],
-            excerpt=parsed_props["excerpt"],
-            cover=parsed_props["cover"],
-            published=parsed_props["published"],
-            content=parsed_props["content"],
-            url=parsed_props["url"],
-            number=parsed_props["number"],
-            select=parsed_props["select"],
-            multi_select=parsed_props["multi_select"],
-            people=parsed_props["people"],
-            files=parsed_props["files"],
-            status=parsed_props["status"],
-            relation=parsed_props["relation"],
-            formula=parsed_props["formula"],
-            rollup=parsed_props["rollup"],
-            created_by=parsed_props["created_by"],
-            last_edited_by=parsed_props["last_edited_by"],
-            created_time=parsed_props["created_time"],
-            last_edited_time=parsed_props["last_edited_time"],
+        # Check cache first; concurrent misses share a single Notion fetch
+        # and stale entries are served while they refresh in the background
+        post, cache_status = await cache.get_or_set(
+            f"post_{slug}",
+            lambda: render_post(slug),
+            ttl=POST_TTL,
+            stale_ttl=CACHE_STALE_TTL,
+            lock_timeout=CACHE_LOCK_TIMEOUT
         )
         
-        # Cache the post for 10 minutes (longer than list since content is more expensive)
-        cache.set(cache_key, post_detail, ttl=600)
+        if cache_status != "MISS":
+            logger.info(f"Returning cached post: {slug} ({cache_status})")
         
-        # Set cache headers for fresh responses
-        response.headers["Cache-Control"] = "public, max-age=600"
-        response.headers["X-Cache-Status"] = "MISS"
-        
-        logger.info(f"Successfully fetched and cached post: {parsed_props['title']}")
-        
-        return post_detail
+        # Send the pre-serialized body with cache headers
+        return cached_json_response(request, post, {
+            "Cache-Control": cache_control(POST_TTL),
+            "X-Cache-Status": cache_status
+        })
         
     except HTTPException:
         raise
+    except RateLimitExceeded as e:
+        raise upstream_busy(e)
     except Exception as e:
         logger.error(f"Error fetching post with slug {slug}: {str(e)}")
         raise HTTPException(
@@ -181,6 +635,40 @@ async def get_post(slug: str, response: Response):
         )
 
 
+@app.get("/search", response_model=SearchResponse)
+async def search_posts(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    offset: int = Query(0, ge=0)
+):
+    """Search published posts by title, excerpt and content"""
+    try:
+        # Catch up with an index built elsewhere, e.g. by another worker
+        index = await get_posts_index()
+        if index.get("version") is None or index["version"] != searched_version:
+            index_search(index)
+    except RateLimitExceeded as e:
+        raise upstream_busy(e)
+    except Exception as e:
+        logger.error(f"Error loading posts for search: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to search posts: {str(e)}"
+        )
+    
+    started = time.perf_counter()
+    total, results = search_index.search(q, limit, offset)
+    
+    return SearchResponse(
+        query=q,
+        results=results,
+        total=total,
+        offset=offset,
+        limit=limit,
+        took_ms=round((time.perf_counter() - started) * 1000, 3)
+    )
+
+
 @app.post("/webhooks/notion")
 async def handle_notion_webhook(payload: dict):
     """Handle Notion webhook updates"""
@@ -191,18 +679,22 @@ async def handle_notion_webhook(payload: dict):
         event_type = payload.get("event", {}).get("type")
         object_id = payload.get("event", {}).get("object", {}).get("id")
         
-        if event_type in ["page.updated", "page.created", "page.deleted"]:
-            # Clear relevant caches
-            cache.clear_pattern("posts_*")
-            cache.clear_pattern("post_*")
+        if event_type in PAGE_EVENTS:
+            if event_type in ("page.created", "page.undeleted"):
+                # A new page may take a slug that was cached as missing
+                negative_cache.clear()
             
-            logger.info(f"Cleared cache for event: {event_type} on object: {object_id}")
+            # Invalidate only the post this page maps to and patch the list
+            result = await apply_page_event(event_type, object_id)
+            
+            logger.info(f"Updated cache for event: {event_type} on object: {object_id} ({result['invalidated']})")
             
             return {
                 "status": "success",
-                "message": "Cache cleared successfully",
+                "message": "Cache updated successfully",
                 "event_type": event_type,
-                "object_id": object_id
+                "object_id": object_id,
+                "invalidated": result["invalidated"]
             }
         
         return {
@@ -224,8 +716,14 @@ async def clear_cache():
     """Manual cache clearing endpoint"""
     try:
         # Clear all blog-related caches
-        cache.clear_pattern("posts_*")
-        cache.clear_pattern("post_*")
+        await cache.clear_pattern("posts_*")
+        await cache.clear_pattern("post_*")
+        # ...and force the next build to run a full sync
+        await content_sync.reset()
+        negative_cache.clear()
+        render_memo.clear()
+        if CACHE_WARMUP:
+            start_warmup()
         
         logger.info("Manual cache clear requested")
         
@@ -245,24 +743,37 @@ async def clear_cache():
 @app.get("/cache/stats")
 async def get_cache_stats():
     """Get cache statistics"""
-    stats = cache.stats()
-    cleaned = cache.cleanup_expired()
+    # Read-only: expired entries are left to the background sweeper
+    stats = await cache.stats()
     
     return {
         "cache_stats": stats,
-        "expired_cleaned": cleaned,
         "cache_info": {
             "default_ttl": cache.default_ttl,
-            "posts_list_ttl": 300,
-            "individual_post_ttl": 600
-        }
+            "lock_timeout": CACHE_LOCK_TIMEOUT,
+            "stale_ttl": CACHE_STALE_TTL,
+            "posts_list_ttl": POSTS_LIST_TTL,
+            "individual_post_ttl": POST_TTL
+        },
+        "negative_cache_stats": negative_cache.stats(),
+        "sync_stats": content_sync.stats(),
+        "render_memo_stats": render_memo.stats(),
+        "search_stats": search_index.stats(),
+        "email_stats": email_sender.stats(),
+        "warmup": warmup
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Request and stage duration histograms in the Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.post("/contact")
 async def contact(form: ContactForm):
     """Receive contact form submissions"""
     try:
-        send_contact_email(form.name, form.email, form.message)
+        # Sent by the background email worker; only configuration errors surface here
+        queue_contact_email(form.name, form.email, form.message)
         return {"message": "Contact form submitted successfully"}
     except Exception as e:
         logger.error(f"Error sending contact form email: {str(e)}")
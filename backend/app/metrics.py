@@ -0,0 +1,152 @@
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Everything below is a no-op unless METRICS_ENABLED is set
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+
+# Upper bounds, in seconds, of the duration histogram buckets
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Prometheus histogram with one series per value of a single label"""
+    
+    def __init__(self, name: str, description: str, label: str, buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = buckets
+        # Label value -> [count per bucket (the last one is +Inf), sum]
+        self.series: Dict[str, List[float]] = {}
+    
+    def observe(self, label_value: str, value: float) -> None:
+        """Record one observation"""
+        series = self.series.get(label_value)
+        if series is None:
+            series = self.series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+    
+    def render(self) -> List[str]:
+        """Lines in the Prometheus text exposition format"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for label_value, series in sorted(self.series.items()):
+            labels = f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+class Counter:
+    """Prometheus counter with one series per value of a single label"""
+    
+    def __init__(self, name: str, description: str, label: str):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.series: Dict[str, float] = {}
+    
+    def inc(self, label_value: str, amount: float = 1) -> None:
+        """Add to a series"""
+        self.series[label_value] = self.series.get(label_value, 0) + amount
+    
+    def render(self) -> List[str]:
+        """Lines in the Prometheus text exposition format"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for label_value, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return lines
+
+stage_duration = Histogram(
+    "blog_stage_duration_seconds", "Time spent in Notion calls and render stages", "stage"
+)
+stage_payload = Counter(
+    "blog_stage_payload_bytes_total", "Bytes received from Notion or produced per render stage", "stage"
+)
+request_duration = Histogram(
+    "blog_http_request_duration_seconds", "Time spent handling HTTP requests", "route"
+)
+
+# Per-request totals: stage -> [count, seconds, bytes]
+_trace: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("trace", default=None)
+
+def start_trace() -> Dict[str, List[float]]:
+    """Start collecting stage totals for the current request"""
+    trace: Dict[str, List[float]] = {}
+    _trace.set(trace)
+    return trace
+
+def record(stage: str, seconds: float, size: int = 0) -> None:
+    """Record one stage run in the histograms and the current request's trace"""
+    stage_duration.observe(stage, seconds)
+    if size:
+        stage_payload.inc(stage, size)
+    
+    trace = _trace.get()
+    if trace is not None:
+        totals = trace.get(stage)
+        if totals is None:
+            totals = trace[stage] = [0, 0.0, 0]
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] += size
+
+class Span:
+    """Times a `with` block as one run of a stage; set `size` to record a payload size"""
+    
+    __slots__ = ("stage", "size", "started")
+    
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.size = 0
+    
+    def __enter__(self) -> "Span":
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        record(self.stage, time.perf_counter() - self.started, self.size)
+
+class NoopSpan:
+    """Stand-in for Span when metrics are disabled"""
+    
+    __slots__ = ()
+    size = 0
+    
+    def __enter__(self) -> "NoopSpan":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        pass
+    
+    def __setattr__(self, name: str, value) -> None:
+        pass
+
+_noop_span = NoopSpan()
+
+def span(stage: str):
+    """Time a stage: `with span("render_markdown") as s: ...`"""
+    return Span(stage) if METRICS_ENABLED else _noop_span
+
+def server_timing(trace: Dict[str, List[float]], total: float) -> str:
+    """Server-Timing header value with the request's stage totals"""
+    entries = []
+    for stage, (count, seconds, size) in trace.items():
+        desc = f"{count} call{'s' if count != 1 else ''}" + (f", {size} B" if size else "")
+        entries.append(f'{stage};dur={seconds * 1000:.1f};desc="{desc}"')
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = request_duration.render() + stage_duration.render() + stage_payload.render()
+    return "\n".join(lines) + "\n"
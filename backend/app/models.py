@@ -42,6 +42,19 @@ class PostsResponse(BaseModel):
     posts: List[PostSummary]
     total: int
 
+class SearchResult(PostSummary):
+    """Model for a post matching a search, with its relevance score"""
+    score: float
+
+class SearchResponse(BaseModel):
+    """Model for search results response"""
+    query: str
+    results: List[SearchResult]
+    total: int
+    offset: int
+    limit: int
+    took_ms: float
+
 class ErrorResponse(BaseModel):
     """Model for error responses"""
     error: str
@@ -53,3 +66,11 @@ class ContactForm(BaseModel):
     email: str
     message: str
 
+class CachedResponse(BaseModel):
+    """Model for a serialized JSON response body kept in the cache"""
+    body: bytes
+    gzip_body: Optional[bytes] = None
+    etag: str
+    last_modified: Optional[str] = None
+    # When the first Notion-signed file URL in the body expires, if any
+    expiry_time: Optional[str] = None
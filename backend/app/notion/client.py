@@ -1,19 +1,119 @@
 import os
-from notion_client import Client
+import time
+from typing import Optional
+import httpx
+from notion_client import AsyncClient, Client
 from dotenv import load_dotenv
+from app.ratelimit import TokenBucket
+from app.metrics import METRICS_ENABLED, record, span
 
 load_dotenv()
 
-def get_notion():
-    """Initialize and return Notion client"""
+# Shared async client, created once per process (see app lifespan)
+_async_notion: Optional[AsyncClient] = None
+
+# Upstream budget shared by every Notion request of this process; Notion
+# allows an average of ~3 requests per second per integration
+notion_budget = TokenBucket(
+    rate=float(os.getenv("NOTION_RATE_LIMIT", "3")),
+    capacity=float(os.getenv("NOTION_RATE_BURST", "3"))
+)
+
+def get_api_key():
+    """Get the Notion API key from environment"""
     api_key = os.getenv("NOTION_API_KEY")
     if not api_key:
         raise ValueError("NOTION_API_KEY environment variable is required")
-    return Client(auth=api_key)
+    return api_key
+
+def get_base_url() -> str:
+    """Get the Notion API root URL (overridden to test against a local fake server)"""
+    return os.getenv("NOTION_BASE_URL", "https://api.notion.com")
+
+def get_notion():
+    """Initialize and return Notion client"""
+    return Client(auth=get_api_key(), base_url=get_base_url())
+
+def get_async_notion() -> AsyncClient:
+    """Return the shared async Notion client, creating it on first use"""
+    global _async_notion
+    if _async_notion is None:
+        # One pooled HTTP client so requests reuse keep-alive connections,
+        # with every request drawing from the shared upstream budget
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("NOTION_MAX_CONNECTIONS", "10")),
+                max_keepalive_connections=int(os.getenv("NOTION_MAX_KEEPALIVE", "10")),
+            )
+        )
+        http_client = httpx.AsyncClient(
+            transport=BudgetedTransport(
+                transport,
+                notion_budget,
+                float(os.getenv("NOTION_BUDGET_TIMEOUT", "10"))
+            )
+        )
+        _async_notion = AsyncClient(auth=get_api_key(), client=http_client, base_url=get_base_url())
+    return _async_notion
+
+class BudgetedTransport(httpx.AsyncBaseTransport):
+    """HTTP transport that takes a token from a budget before each request.
+    
+    Requests queue for a token for up to `timeout` seconds and are shed
+    with RateLimitExceeded beyond that.
+    """
+    
+    def __init__(self, transport: httpx.AsyncBaseTransport, budget: TokenBucket, timeout: float):
+        self.transport = transport
+        self.budget = budget
+        self.timeout = timeout
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not METRICS_ENABLED:
+            await self.budget.acquire(self.timeout)
+            return await self.transport.handle_async_request(request)
+        
+        started = time.perf_counter()
+        await self.budget.acquire(self.timeout)
+        waited = time.perf_counter() - started
+        if waited > 0.001:
+            record("notion.budget_wait", waited)
+        
+        # e.g. "/v1/databases/{id}/query" is timed as "notion.databases.query"
+        parts = request.url.path.strip("/").split("/")
+        stage = ".".join(["notion", *parts[1:2], *parts[3:4]])
+        with span(stage) as timing:
+            response = await self.transport.handle_async_request(request)
+            await response.aread()
+            timing.size = len(response.content)
+        return response
+    
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+async def close_async_notion() -> None:
+    """Close the shared async Notion client and its connection pool"""
+    global _async_notion
+    if _async_notion is not None:
+        await _async_notion.aclose()
+        _async_notion = None
+
+def get_max_concurrency() -> int:
+    """Get the maximum number of concurrent Notion requests for batched fetches"""
+    # Notion allows an average of ~3 requests per second per integration
+    return max(1, int(os.getenv("NOTION_MAX_CONCURRENCY", "3")))
+
+def get_max_block_depth() -> int:
+    """Get the maximum nesting depth fetched when rendering a page"""
+    return max(0, int(os.getenv("NOTION_MAX_BLOCK_DEPTH", "8")))
+
+def get_max_blocks() -> int:
+    """Get the maximum number of blocks fetched when rendering a page"""
+    return max(1, int(os.getenv("NOTION_MAX_BLOCKS", "5000")))
 
 def get_database_id():
     """Get the Notion database ID from environment"""
     database_id = os.getenv("NOTION_DATABASE_ID")
     if not database_id:
         raise ValueError("NOTION_DATABASE_ID environment variable is required")
-    return database_id
\ No newline at end of file
+    return database_id
@@ -1,37 +1,78 @@
-from typing import List, Dict, Any
-from app.notion.client import get_notion, get_database_id
+import asyncio
+import itertools
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional, Tuple
+from notion_client.helpers import async_iterate_paginated_api
+from app.notion.client import (
+    get_async_notion,
+    get_database_id,
+    get_max_concurrency,
+    get_max_block_depth,
+    get_max_blocks,
+)
+from app.metrics import span
 
-def query_database() -> List[Dict[str, Any]]:
-    """Query Notion database for published posts"""
-    notion = get_notion()
+async def iter_query_database(page_size: int = 100, edited_since: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Stream published posts from the Notion database, following pagination cursors.
+    
+    With `edited_since`, stream every page edited at or after that time
+    instead, published or not, so unpublished posts can be noticed too.
+    """
+    notion = get_async_notion()
     database_id = get_database_id()
     
-    response = notion.databases.query(
-        database_id=database_id,
-        filter={
+    if edited_since:
+        query_filter = {
+            "timestamp": "last_edited_time",
+            "last_edited_time": {
+                "on_or_after": edited_since
+            }
+        }
+    else:
+        query_filter = {
             "property": "Published",
             "checkbox": {
                 "equals": True
             }
-        },
+        }
+    
+    async for page in async_iterate_paginated_api(
+        notion.databases.query,
+        database_id=database_id,
+        filter=query_filter,
         sorts=[
             {
                 "property": "Date",
                 "direction": "descending"
             }
-        ]
-    )
-    
-    return response.get("results", [])
+        ],
+        page_size=page_size
+    ):
+        yield page
 
-def parse_page_properties(page: Dict[str, Any]) -> Dict[str, Any]:
-    """Extract and format page properties"""
+async def query_database(page_size: int = 100, edited_since: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Query Notion database for published posts"""
+    with span("query_database"):
+        return [page async for page in iter_query_database(page_size, edited_since)]
+
+async def get_page(page_id: str) -> Dict[str, Any]:
+    """Retrieve a single page with its properties"""
+    notion = get_async_notion()
+    return await notion.pages.retrieve(page_id=page_id)
+
+async def parse_page_summary(page: Dict[str, Any], blocks: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Extract listing fields from page properties, fetching blocks only for the cover fallback"""
     properties = page.get("properties", {})
     page_id = page.get("id")
-    blocks = get_page_content(page_id)
 
-    cover = get_cover_from_property(properties.get("Cover", {}))
+    cover_source: Any = properties.get("Cover", {})
+    cover = get_cover_from_property(cover_source)
     if not cover:
+        if blocks is None:
+            blocks = await get_page_content(page_id)
+        cover_source = next((block for block in blocks if block.get("type") == "image"), None)
         cover = get_cover_from_blocks(blocks)
 
     return {
@@ -42,7 +83,35 @@ def parse_page_properties(page: Dict[str, Any]) -> Dict[str, Any]:
         "excerpt": get_rich_text_from_property(properties.get("Excerpt", {})),
         "cover": cover,
         "published": get_checkbox_from_property(properties.get("Published", {})),
-        "content": parse_blocks_to_markdown(blocks),
+        # When the cover's signed URL stops working
+        "expiry_time": get_expiry_time(cover_source),
+    }
+
+async def parse_page_summaries(pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Extract listing fields for several pages, fetching cover fallbacks concurrently"""
+    missing_cover = [
+        page.get("id") for page in pages
+        if not get_cover_from_property(page.get("properties", {}).get("Cover", {}))
+    ]
+    blocks_by_id = await fetch_blocks_batch(missing_cover)
+
+    return [
+        await parse_page_summary(page, blocks_by_id.get(page.get("id")))
+        for page in pages
+    ]
+
+async def parse_page_properties(page: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract and format page properties"""
+    properties = page.get("properties", {})
+    page_id = page.get("id")
+    blocks = await get_page_content(page_id)
+
+    summary = await parse_page_summary(page, blocks)
+    content = await parse_blocks_to_markdown(blocks)
+
+    return {
+        **summary,
+        "content": content,
         "url": get_url_from_property(properties.get("URL", {})),
         "number": get_number_from_property(properties.get("Number", {})),
         "select": get_select_from_property(properties.get("Select", {})),
@@ -56,7 +125,10 @@ def parse_page_properties(page: Dict[str, Any]) -> Dict[str, Any]:
         "created_by": get_created_by_from_property(properties.get("Created by", {})),
         "last_edited_by": get_last_edited_by_from_property(properties.get("Last edited by", {})),
         "created_time": get_created_time_from_property(properties.get("Created time", {})),
-        "last_edited_time": get_last_edited_time_from_property(properties.get("Last edited time", {})),
+        # Fall back to the page's own timestamp when the database has no such property
+        "last_edited_time": get_last_edited_time_from_property(properties.get("Last edited time", {})) or page.get("last_edited_time", ""),
+        # When the first signed URL among the properties and the block tree stops working
+        "expiry_time": get_expiry_time([properties, blocks]),
     }
 
 def get_title_from_property(title_property: Dict[str, Any]) -> str:
@@ -194,99 +266,318 @@ def get_cover_from_blocks(blocks: List[Dict[str, Any]]) -> str:
     return ""
 
 
-def parse_blocks_to_markdown(blocks: List[Dict[str, Any]]) -> str:
-    """Convert Notion blocks to markdown"""
-    markdown_content = []
+def get_expiry_time(value: Any) -> Optional[str]:
+    """Earliest expiry_time of the Notion-hosted files in a property, a block tree or a list of them"""
+    if isinstance(value, list):
+        times = [get_expiry_time(item) for item in value]
+    elif isinstance(value, dict):
+        # Notion-hosted files come as {"type": "file", "file": {"url": ..., "expiry_time": ...}}
+        file_obj = value.get("file") if value.get("type") == "file" else None
+        times = [file_obj.get("expiry_time") if isinstance(file_obj, dict) else None]
+        times.extend(get_expiry_time(item) for item in value.values() if isinstance(item, (dict, list)))
+    else:
+        return None
+    return min((time for time in times if time), default=None)
+
+
+async def parse_blocks_to_markdown(blocks: List[Dict[str, Any]]) -> str:
+    """Convert Notion blocks to markdown, fetching nested children first"""
+    with span("fetch_block_tree"):
+        await fetch_block_tree(blocks)
+    with span("render_markdown") as timing:
+        markdown = render_blocks_to_markdown(blocks)
+        timing.size = len(markdown)
+    return markdown
+
+async def fetch_block_tree(
+    blocks: List[Dict[str, Any]],
+    max_depth: Optional[int] = None,
+    max_blocks: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Attach nested children to blocks, fetching each depth level concurrently"""
+    if max_depth is None:
+        max_depth = get_max_block_depth()
+    if max_blocks is None:
+        max_blocks = get_max_blocks()
+
+    level = blocks
+    total_blocks = len(blocks)
+    depth = 0
+
+    # Breadth-first: one concurrent batch per level, so latency grows with
+    # the depth of the tree rather than with the number of nested blocks
+    while level and depth < max_depth and total_blocks < max_blocks:
+        # Children of blocks that render nothing (child pages and databases) are never fetched
+        parents = [
+            block for block in level
+            if block.get("has_children") and "children" not in block and block.get("type") in BLOCK_RENDERERS
+        ]
+        if not parents:
+            break
+
+        children_by_id = await fetch_blocks_batch([block["id"] for block in parents])
+
+        next_level = []
+        for block in parents:
+            children = children_by_id[block["id"]][:max(0, max_blocks - total_blocks)]
+            total_blocks += len(children)
+            block["children"] = children
+            next_level.extend(children)
+
+        level = next_level
+        depth += 1
+
+    return blocks
+
+class RenderMemo:
+    """Rendered markdown of blocks, keyed by block id and last_edited_time.
     
-    for block in blocks:
-        block_type = block.get("type")
+    An entry is only reused while the block's children render to the same
+    fragments, so an edit anywhere below a block re-renders it too. Blocks
+    edited in the last `settle_seconds` aren't memoized, since Notion
+    reports last_edited_time to the minute and could miss a second edit.
+    Nor are blocks showing Notion-hosted media, whose signed URLs expire.
+    """
+    
+    def __init__(self, max_entries: int = 50000, settle_seconds: float = 120):
+        self.max_entries = max_entries
+        self.settle_seconds = settle_seconds
+        # (block id, last_edited_time) -> (child fragments, fragment), least recently used first
+        self.entries: OrderedDict[Tuple[str, str], Tuple[Optional[List[Optional[str]]], Optional[str]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def settled_before(self) -> str:
+        """Blocks last edited before this timestamp can be memoized"""
+        if not self.max_entries:
+            # Memo disabled, nothing sorts before ""
+            return ""
+        settled = datetime.now(timezone.utc) - timedelta(seconds=self.settle_seconds)
+        return settled.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    
+    def trim(self) -> None:
+        """Evict the least recently used blocks beyond `max_entries`"""
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Forget every rendered block"""
+        self.entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get render memo statistics"""
+        return {
+            "blocks": len(self.entries),
+            "max_blocks": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+# Rendered blocks shared by every page render of this process
+render_memo = RenderMemo(max_entries=int(os.getenv("RENDER_MEMO_MAX_BLOCKS", "50000")))
+
+def render_blocks_to_markdown(blocks: List[Dict[str, Any]]) -> str:
+    """Convert a Notion block tree to markdown, reusing memoized blocks"""
+    settled_before = render_memo.settled_before()
+    markdown = join_fragments([render_block(block, settled_before) for block in blocks])
+    render_memo.trim()
+    return markdown
+    
+def render_block(block: Dict[str, Any], settled_before: str) -> Optional[str]:
+    """Render a block and its children; None for blocks that produce no markdown"""
+    children = block.get("children")
+    # Children first, so a parent is reused only if they are unchanged
+    child_fragments = [render_block(child, settled_before) for child in children] if children else None
+    block_type = block.get("type")
+    renderer = BLOCK_RENDERERS.get(block_type)
         
-        if block_type == "paragraph":
-            text = extract_rich_text(block["paragraph"]["rich_text"])
-            if text.strip():
-                markdown_content.append(text)
+    edited = block.get("last_edited_time")
+    # Notion-hosted media render to a signed URL that changes without an edit
+    if not edited or edited >= settled_before or "id" not in block or block.get(block_type, {}).get("type") == "file":
+        return renderer(block, child_fragments) if renderer is not None else None
         
-        elif block_type == "heading_1":
-            text = extract_rich_text(block["heading_1"]["rich_text"])
-            markdown_content.append(f"# {text}")
+    key = (block["id"], edited)
+    entry = render_memo.entries.get(key)
+    if entry is not None and entry[0] == child_fragments:
+        render_memo.entries.move_to_end(key)
+        render_memo.hits += 1
+        return entry[1]
         
-        elif block_type == "heading_2":
-            text = extract_rich_text(block["heading_2"]["rich_text"])
-            markdown_content.append(f"## {text}")
+    render_memo.misses += 1
+    fragment = renderer(block, child_fragments) if renderer is not None else None
+    render_memo.entries[key] = (child_fragments, fragment)
+    return fragment
         
-        elif block_type == "heading_3":
-            text = extract_rich_text(block["heading_3"]["rich_text"])
-            markdown_content.append(f"### {text}")
+def join_fragments(fragments: Optional[List[Optional[str]]]) -> str:
+    """Join rendered blocks into one markdown document"""
+    return "\n\n".join([fragment for fragment in fragments or () if fragment is not None])
         
-        elif block_type == "bulleted_list_item":
-            text = extract_rich_text(block["bulleted_list_item"]["rich_text"])
-            markdown_content.append(f"- {text}")
+def render_paragraph(block: Dict[str, Any], children: Optional[List[Optional[str]]]) -> Optional[str]:
+    """Render a paragraph, skipping empty ones without children"""
+    text = extract_rich_text(block["paragraph"]["rich_text"])
+    parts = [text] if text.strip() else []
+    if children:
+        parts.append(join_fragments(children))
+    return "\n\n".join(parts) if parts else None
         
-        elif block_type == "numbered_list_item":
-            text = extract_rich_text(block["numbered_list_item"]["rich_text"])
-            markdown_content.append(f"1. {text}")
+def render_heading(block: Dict[str, Any], children: Optional[List[Optional[str]]]) -> str:
+    """Render a heading, with the content of a toggleable heading under it"""
+    block_type = block["type"]
+    heading = f"{'#' * int(block_type[-1])} {extract_rich_text(block[block_type]['rich_text'])}"
+    if children:
+        # Toggleable heading
+        heading = f"{heading}\n\n{join_fragments(children)}"
+    return heading
         
-        elif block_type == "code":
-            code_text = extract_rich_text(block["code"]["rich_text"])
-            language = block["code"].get("language", "")
-            markdown_content.append(f"""```{language}
-{code_text}
-```""")
+def render_bulleted_list_item(block: Dict[str, Any], children: Optional[List[Optional[str]]]) -> str:
+    """Render a bulleted list item"""
+    return render_list_item("- ", extract_rich_text(block["bulleted_list_item"]["rich_text"]), children)
         
-        elif block_type == "image":
-            image_url = ""
-            if block["image"]["type"] == "file":
-                image_url = block["image"]["file"]["url"]
-            elif block["image"]["type"] == "external":
-                image_url = block["image"]["external"]["url"]
+def render_numbered_list_item(block: Dict[str, Any], children: Optional[List[Optional[str]]]) -> str:
+    """Render a numbered list item"""
+    return render_list_item("1. ", extract_rich_text(block["numbered_list_item"]["rich_text"]), children)
             
-            caption = ""
-            if block["image"].get("caption"):
-                caption = extract_rich_text(block["image"]["caption"])
+def render_to_do(block: Dict[str, Any], children: Optional[List[Optional[str]]]) -> str:
+    """Render a to-do as a task list item"""
+    marker = "- [x] " if block["to_do"].get("checked") else "- [ ] "
+    return render_list_item(marker, extract_rich_text(block["to_do"]["rich_text"]), children)
             
-            markdown_content.append(f"![{caption}]({image_url})")
+def render_toggle(block: Dict[str, Any], children: Optional[List[Optional[str]]]) -> str:
+    """Render a toggle as an HTML details element"""
+    text = extract_rich_text(block["toggle"]["rich_text"])
+    return f"<details>\n<summary>{text}</summary>\n\n{join_fragments(children)}\n\n</details>"
         
-        elif block_type == "quote":
-            text = extract_rich_text(block["quote"]["rich_text"])
-            markdown_content.append(f"> {text}")
+def render_callout(block: Dict[str, Any], children: Optional[List[Optional[str]]]) -> str:
+    """Render a callout as a quote, prefixed with its emoji icon"""
+    text = extract_rich_text(block["callout"]["rich_text"])
+    icon = block["callout"].get("icon") or {}
+    if icon.get("type") == "emoji":
+        text = f"{icon['emoji']} {text}"
+    return render_quote(text, children)
         
-        elif block_type == "divider":
-            markdown_content.append("---")
+def render_code(block: Dict[str, Any], children: Optional[List[Optional[str]]]) -> str:
+    """Render a fenced code block"""
+    code_text = extract_rich_text(block["code"]["rich_text"])
+    language = block["code"].get("language", "")
+    return f"```{language}\n{code_text}\n```"
 
-        elif block_type == "table":
-            table_rows = get_block_children(block["id"])
+def render_image(block: Dict[str, Any], children: Optional[List[Optional[str]]]) -> str:
+    """Render an image with its caption as alt text"""
+    image = block["image"]
+    image_url = image.get(image["type"], {}).get("url", "") if image["type"] in ("file", "external") else ""
+    caption = extract_rich_text(image["caption"]) if image.get("caption") else ""
+    return f"![{caption}]({image_url})"
+
+def render_quote_block(block: Dict[str, Any], children: Optional[List[Optional[str]]]) -> str:
+    """Render a quote"""
+    return render_quote(extract_rich_text(block["quote"]["rich_text"]), children)
             
-            # Initialize a list to hold the rows of the table
-            table_data = []
+def render_divider(block: Dict[str, Any], children: Optional[List[Optional[str]]]) -> str:
+    """Render a divider"""
+    return "---"
             
-            # Assuming the first row is the header
-            header_row = table_rows[0]
-            header_cells = header_row.get("table_row", {}).get("cells", [])
-            header_texts = [extract_rich_text(cell) for cell in header_cells]
-            table_data.append(header_texts)
+def render_container(block: Dict[str, Any], children: Optional[List[Optional[str]]]) -> Optional[str]:
+    """Render the content of a column or synced block"""
+    # Markdown has no columns, so column content is rendered in order
+    return join_fragments(children) if children else None
             
-            # Create the markdown separator for the header
-            separator = ["---" for _ in header_texts]
-            table_data.append(separator)
+def render_table(block: Dict[str, Any], children: Optional[List[Optional[str]]]) -> Optional[str]:
+    """Render a table, using its first row as the header"""
+    if not children:
+        return None
+    # The first row is the header
+    columns = len(block["children"][0].get("table_row", {}).get("cells", []))
+    separator = "| " + " | ".join(["---"] * columns) + " |"
+    return "\n".join([children[0], separator, *children[1:]])
             
-            # Process the rest of the rows
-            for row_block in table_rows[1:]:
-                row_cells = row_block.get("table_row", {}).get("cells", [])
-                row_texts = [extract_rich_text(cell) for cell in row_cells]
-                table_data.append(row_texts)
+def render_table_row(block: Dict[str, Any], children: Optional[List[Optional[str]]]) -> str:
+    """Render one row of a table"""
+    cells = block.get("table_row", {}).get("cells", [])
+    return "| " + " | ".join([extract_rich_text(cell) for cell in cells]) + " |"
             
-            # Format the table as markdown
-            markdown_table = "\n".join(["| " + " | ".join(row) + " |" for row in table_data])
-            markdown_content.append(markdown_table)
+# Block type -> function rendering it, given the rendered fragments of its children
+BLOCK_RENDERERS: Dict[str, Callable[[Dict[str, Any], Optional[List[Optional[str]]]], Optional[str]]] = {
+    "paragraph": render_paragraph,
+    "heading_1": render_heading,
+    "heading_2": render_heading,
+    "heading_3": render_heading,
+    "bulleted_list_item": render_bulleted_list_item,
+    "numbered_list_item": render_numbered_list_item,
+    "to_do": render_to_do,
+    "toggle": render_toggle,
+    "callout": render_callout,
+    "code": render_code,
+    "image": render_image,
+    "quote": render_quote_block,
+    "divider": render_divider,
+    "column_list": render_container,
+    "column": render_container,
+    "synced_block": render_container,
+    "table": render_table,
+    "table_row": render_table_row,
+}
     
-    return "\n\n".join(markdown_content)
+def render_list_item(marker: str, text: str, children: Optional[List[Optional[str]]]) -> str:
+    """Render a list item with its nested blocks indented under it"""
+    item = f"{marker}{text}"
+    if children:
+        item = f"{item}\n\n{indent_markdown(join_fragments(children), ' ' * len(marker))}"
+    return item
 
-def get_block_children(block_id: str) -> List[Dict[str, Any]]:
-    """Get children of a block"""
-    notion = get_notion()
+def render_quote(text: str, children: Optional[List[Optional[str]]]) -> str:
+    """Render a quote-style block with its nested blocks inside the quote"""
+    quote = text
+    if children:
+        quote = f"{quote}\n\n{join_fragments(children)}"
+    return indent_markdown(quote, "> ", blank_lines=True)
+
+def indent_markdown(markdown: str, prefix: str, blank_lines: bool = False) -> str:
+    """Prefix every line of a markdown fragment"""
+    return "\n".join(
+        f"{prefix}{line}" if line or blank_lines else line
+        for line in markdown.split("\n")
+    )
+
+async def iter_block_children(block_id: str, page_size: int = 100) -> AsyncIterator[Dict[str, Any]]:
+    """Stream children of a block, following pagination cursors"""
+    notion = get_async_notion()
     
-    response = notion.blocks.children.list(block_id=block_id)
-    return response.get("results", [])
+    async for block in async_iterate_paginated_api(
+        notion.blocks.children.list,
+        block_id=block_id,
+        page_size=page_size
+    ):
+        yield block
+
+async def get_block_children(block_id: str, page_size: int = 100) -> List[Dict[str, Any]]:
+    """Get children of a block"""
+    return [block async for block in iter_block_children(block_id, page_size)]
+
+async def fetch_blocks_batch(block_ids: List[str], concurrency: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Fetch the children of several blocks concurrently, keyed by block id"""
+    if concurrency is None:
+        concurrency = get_max_concurrency()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    # Duplicate ids within one batch are fetched only once
+    unique_ids = list(dict.fromkeys(block_ids))
+
+    async def fetch(block_id: str) -> List[Dict[str, Any]]:
+        async with semaphore:
+            return await get_block_children(block_id)
+
+    results = await asyncio.gather(*(fetch(block_id) for block_id in unique_ids))
+    return dict(zip(unique_ids, results))
+
+def annotation_markers(bold: bool, italic: bool, code: bool, strikethrough: bool) -> Tuple[str, str]:
+    """Markdown opening and closing annotated text, nested with bold innermost"""
+    markers = [marker for marker, on in zip(("**", "*", "`", "~~"), (bold, italic, code, strikethrough)) if on]
+    return "".join(reversed(markers)), "".join(markers)
+
+# Markers for every combination of (bold, italic, code, strikethrough)
+ANNOTATION_MARKERS = {
+    flags: annotation_markers(*flags) for flags in itertools.product((False, True), repeat=4)
+}
 
 def extract_rich_text(rich_text_list: List[Dict[str, Any]]) -> str:
     """Extract plain text from rich text objects"""
@@ -294,17 +585,18 @@ def extract_rich_text(rich_text_list: List[Dict[str, Any]]) -> str:
     
     for text_obj in rich_text_list:
         content = text_obj.get("text", {}).get("content", "")
-        annotations = text_obj.get("annotations", {})
+        annotations = text_obj.get("annotations")
         
         # Apply formatting
-        if annotations.get("bold"):
-            content = f"**{content}**"
-        if annotations.get("italic"):
-            content = f"*{content}*"
-        if annotations.get("code"):
-            content = f"`{content}`"
-        if annotations.get("strikethrough"):
-            content = f"~~{content}~~"
+        if annotations:
+            opening, closing = ANNOTATION_MARKERS[(
+                bool(annotations.get("bold")),
+                bool(annotations.get("italic")),
+                bool(annotations.get("code")),
+                bool(annotations.get("strikethrough"))
+            )]
+            if opening:
+                content = f"{opening}{content}{closing}"
         
         # Handle links
         if text_obj.get("href"):
@@ -314,9 +606,12 @@ def extract_rich_text(rich_text_list: List[Dict[str, Any]]) -> str:
     
     return "".join(text_parts)
 
-def get_page_content(page_id: str) -> List[Dict[str, Any]]:
+async def iter_page_content(page_id: str, page_size: int = 100) -> AsyncIterator[Dict[str, Any]]:
+    """Stream page content blocks, following pagination cursors"""
+    async for block in iter_block_children(page_id, page_size):
+        yield block
+
+async def get_page_content(page_id: str, page_size: int = 100) -> List[Dict[str, Any]]:
     """Get page content blocks"""
-    notion = get_notion()
-    
-    blocks_response = notion.blocks.children.list(block_id=page_id)
-    return blocks_response.get("results", [])
+    with span("get_page_content"):
+        return [block async for block in iter_page_content(page_id, page_size)]
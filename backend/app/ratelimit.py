@@ -0,0 +1,98 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Request
+
+class RateLimitExceeded(Exception):
+    """Raised when a rate limited call would have to wait too long"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Token bucket holding up to `capacity` tokens, refilled at `rate` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self) -> None:
+        """Add the tokens earned since the last refill"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Take a token if one is available; returns 0, or the seconds until one will be"""
+        self.refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self, timeout: float) -> None:
+        """Wait for a token, queued behind earlier callers.
+
+        Raises RateLimitExceeded instead of waiting longer than `timeout`
+        seconds.
+        """
+        self.refill()
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if wait > timeout:
+            raise RateLimitExceeded(wait)
+
+        # Reserve the token now (possibly going negative) so later callers queue behind this one
+        self.tokens -= 1
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class RateLimiter:
+    """Token buckets per client allowing `requests` requests every `period` seconds.
+
+    Only the `max_clients` most recently seen clients are tracked; a
+    forgotten client starts again with a full bucket.
+    """
+
+    def __init__(self, requests: int, period: float, max_clients: int = 10000):
+        self.requests = requests
+        self.period = period
+        self.max_clients = max_clients
+        self.buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self.limited = 0
+
+    def check(self, client: str) -> float:
+        """Count a request from `client`; returns 0 if allowed, or the seconds to wait"""
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = TokenBucket(self.requests / self.period, self.requests)
+            while len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client)
+
+        retry_after = bucket.take()
+        if retry_after > 0:
+            self.limited += 1
+        return retry_after
+
+def parse_rate_limit(name: str, default: str) -> Optional[RateLimiter]:
+    """Create a rate limiter from an environment variable like "30/10" (30 requests per 10 seconds); "0" disables it"""
+    value = os.getenv(name, default).strip()
+    requests, _, period = value.partition("/")
+    if not int(requests):
+        return None
+    return RateLimiter(int(requests), float(period or 1))
+
+def client_address(request: Request) -> str:
+    """Address rate limits are counted against"""
+    # Only trust X-Forwarded-For behind a proxy that sets it
+    if os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true":
+        forwarded_for = request.headers.get("x-forwarded-for")
+        if forwarded_for:
+            return forwarded_for.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
@@ -0,0 +1,88 @@
+import gzip
+import hashlib
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+from fastapi import Request, Response
+from pydantic import BaseModel
+from app.models import CachedResponse
+from app.metrics import span
+
+# Bodies smaller than this are sent uncompressed
+GZIP_MIN_SIZE = 1024
+
+def render_cached_response(
+    model: BaseModel,
+    last_edited_time: Optional[str] = None,
+    expiry_time: Optional[str] = None
+) -> CachedResponse:
+    """Serialize a response model once, with its validators and a gzip copy of larger bodies"""
+    with span("serialize") as timing:
+        body = model.model_dump_json().encode()
+        gzip_body = gzip.compress(body) if len(body) >= GZIP_MIN_SIZE else None
+        timing.size = len(body)
+    
+    return CachedResponse(
+        body=body,
+        gzip_body=gzip_body,
+        etag=make_etag(body),
+        last_modified=to_http_date(last_edited_time),
+        expiry_time=expiry_time
+    )
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a response body"""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def to_http_date(iso_time: Optional[str]) -> Optional[str]:
+    """Convert a Notion ISO 8601 timestamp to an HTTP date"""
+    if not iso_time:
+        return None
+    try:
+        return format_datetime(datetime.fromisoformat(iso_time.replace("Z", "+00:00")), usegmt=True)
+    except ValueError:
+        return None
+
+def gzip_etag(etag: str) -> str:
+    """ETag of the gzip-encoded representation (a different byte sequence)"""
+    return f'{etag[:-1]}-gzip"'
+
+def is_not_modified(request: Request, cached: CachedResponse) -> bool:
+    """Check If-None-Match (or, without it, If-Modified-Since) against a cached body"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison, as required for If-None-Match
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return cached.etag in tags or gzip_etag(cached.etag) in tags
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and cached.last_modified:
+        try:
+            return parsedate_to_datetime(cached.last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    
+    return False
+
+def cached_json_response(request: Request, cached: CachedResponse, headers: Dict[str, str]) -> Response:
+    """Send a cached body as-is, using the gzip copy when the client accepts it.
+    
+    Conditional requests that match the cached validators get a 304.
+    """
+    headers = {**headers, "Vary": "Accept-Encoding"}
+    if cached.last_modified:
+        headers["Last-Modified"] = cached.last_modified
+    
+    use_gzip = cached.gzip_body is not None and "gzip" in request.headers.get("accept-encoding", "")
+    headers["ETag"] = gzip_etag(cached.etag) if use_gzip else cached.etag
+    
+    if is_not_modified(request, cached):
+        return Response(status_code=304, headers=headers)
+    
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=cached.gzip_body, media_type="application/json", headers=headers)
+    
+    return Response(content=cached.body, media_type="application/json", headers=headers)
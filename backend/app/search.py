@@ -0,0 +1,171 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Word characters in any script; text is casefolded before matching
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# How much more a term counts in a title or excerpt than in the content
+FIELD_WEIGHTS = {"title": 3.0, "excerpt": 2.0, "content": 1.0}
+
+# Query terms beyond this many are ignored
+MAX_QUERY_TERMS = 10
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase search terms"""
+    return TOKEN_PATTERN.findall(text.casefold())
+
+class SearchIndex:
+    """In-memory inverted index over post titles, excerpts and rendered content.
+    
+    Each term maps to the posts containing it with a field-weighted term
+    frequency. Posts are added and removed one at a time, so keeping the
+    index current costs only the posts that changed. Queries match posts
+    containing every term, ranked by BM25.
+    """
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # Term -> page id -> weighted term frequency
+        self.postings: Dict[str, Dict[str, float]] = {}
+        # Page id -> summary, versions, content term counts and weighted terms
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        # Page id -> sum of its weighted term frequencies
+        self.lengths: Dict[str, float] = {}
+        self.total_length = 0.0
+        # Posts whose indexed content is from their current version
+        self.posts_with_content = 0
+    
+    def add(self, page_id: str, summary: Dict[str, Any], version: Optional[str], content: Optional[str] = None) -> None:
+        """Index a post, replacing its previous version.
+        
+        Without `content`, the content indexed before (if any) is kept
+        until the post is rendered again.
+        """
+        document = self.documents.get(page_id)
+        if document is not None and document["version"] == version and (
+            content is None or document["content_version"] == version
+        ):
+            document["summary"] = summary
+            return
+        
+        if content is not None:
+            content_terms, content_version = Counter(tokenize(content)), version
+        elif document is not None:
+            content_terms, content_version = document["content_terms"], document["content_version"]
+        else:
+            content_terms, content_version = Counter(), None
+        fields = {
+            "title": Counter(tokenize(summary.get("title") or "")),
+            "excerpt": Counter(tokenize(summary.get("excerpt") or "")),
+            "content": content_terms,
+        }
+        
+        self.remove(page_id)
+        terms: Dict[str, float] = {}
+        for field, counts in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for term, count in counts.items():
+                terms[term] = terms.get(term, 0.0) + weight * count
+        
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[page_id] = frequency
+        length = sum(terms.values())
+        self.lengths[page_id] = length
+        self.total_length += length
+        self.documents[page_id] = {
+            "summary": summary,
+            "version": version,
+            # Version of the page the indexed content was rendered from
+            "content_version": content_version,
+            "content_terms": content_terms,
+            "terms": terms
+        }
+        if content_version is not None and content_version == version:
+            self.posts_with_content += 1
+    
+    def remove(self, page_id: str) -> bool:
+        """Drop a post from the index"""
+        document = self.documents.pop(page_id, None)
+        if document is None:
+            return False
+        if document["content_version"] is not None and document["content_version"] == document["version"]:
+            self.posts_with_content -= 1
+        
+        for term in document["terms"]:
+            posting = self.postings[term]
+            del posting[page_id]
+            if not posting:
+                del self.postings[term]
+        self.total_length -= self.lengths.pop(page_id)
+        return True
+    
+    def retain(self, page_ids: Iterable[str]) -> int:
+        """Drop every post not in page_ids; returns how many were dropped"""
+        keep = set(page_ids)
+        removed = [page_id for page_id in self.documents if page_id not in keep]
+        for page_id in removed:
+            self.remove(page_id)
+        return len(removed)
+    
+    def search(self, query: str, limit: int = 10, offset: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        """Rank the posts matching every query term; returns the total matches and one page of results"""
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        postings = [self.postings.get(term) for term in terms]
+        if not terms or not all(postings):
+            return 0, []
+        
+        # Intersect starting from the rarest term
+        postings.sort(key=len)
+        candidates = postings[0].keys()
+        for posting in postings[1:]:
+            candidates = candidates & posting.keys()
+            if not candidates:
+                return 0, []
+        
+        documents = len(self.documents)
+        weights = [
+            (posting, math.log(1 + (documents - len(posting) + 0.5) / (len(posting) + 0.5)) * (self.k1 + 1))
+            for posting in postings
+        ]
+        
+        # BM25: norm is k1 * (1 - b + b * length / average length)
+        lengths = self.lengths
+        base = self.k1 * (1 - self.b)
+        scale = self.k1 * self.b * documents / self.total_length
+        scores = []
+        for page_id in candidates:
+            norm = base + scale * lengths[page_id]
+            score = 0.0
+            for posting, weight in weights:
+                frequency = posting[page_id]
+                score += weight * frequency / (frequency + norm)
+            scores.append((score, page_id))
+        
+        top = heapq.nlargest(offset + limit, scores)[offset:]
+        return len(candidates), [
+            {**self.documents[page_id]["summary"], "score": round(score, 4)}
+            for score, page_id in top
+        ]
+    
+    def clear(self) -> None:
+        """Drop every post"""
+        self.postings.clear()
+        self.documents.clear()
+        self.lengths.clear()
+        self.total_length = 0.0
+        self.posts_with_content = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get search index statistics"""
+        return {
+            "posts": len(self.documents),
+            "posts_with_content": self.posts_with_content,
+            "terms": len(self.postings)
+        }
+
+# Global search index, kept current as posts are listed, rendered and changed
+search_index = SearchIndex()
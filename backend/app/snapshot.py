@@ -0,0 +1,145 @@
+import gzip
+import logging
+import os
+from contextlib import suppress
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, Optional, Tuple
+from dotenv import load_dotenv
+from app.models import CachedResponse
+from app.responses import GZIP_MIN_SIZE, make_etag
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class Snapshot:
+    """Directory of pre-rendered JSON responses.
+    
+    `posts.json` holds the posts list and `posts/{slug}.json` each post.
+    Every file has a gzip copy next to it (`.json.gz`) and a post's mtime
+    set to its last edit (the list's to when it was written), so any
+    static file server can serve the directory as well. Files linking to
+    Notion-hosted files also have a `.json.expires` file next to them,
+    holding when the first of those signed URLs expires.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = os.path.abspath(directory)
+        # Parsed files by name, with the (inode, mtime, size) they were read at;
+        # a re-rendered post can keep its mtime (its last edit) and size
+        self.loaded: Dict[str, Tuple[Tuple[int, int, int], CachedResponse]] = {}
+    
+    def path(self, name: str) -> Optional[str]:
+        """Path of the JSON file for `name` (e.g. "posts" or "posts/my-slug"), if inside the directory"""
+        path = os.path.abspath(os.path.join(self.directory, f"{name}.json"))
+        if os.path.commonpath([self.directory, path]) != self.directory:
+            return None
+        return path
+    
+    def read(self, name: str) -> Optional[CachedResponse]:
+        """Load a pre-rendered response, or None if it is not in the snapshot"""
+        path = self.path(name)
+        if path is None:
+            return None
+        
+        try:
+            stat = os.stat(path)
+            version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            loaded = self.loaded.get(name)
+            if loaded is not None and loaded[0] == version:
+                return loaded[1]
+            
+            with open(path, "rb") as f:
+                body = f.read()
+            gzip_body = None
+            if len(body) >= GZIP_MIN_SIZE:
+                try:
+                    with open(f"{path}.gz", "rb") as f:
+                        gzip_body = f.read()
+                except FileNotFoundError:
+                    gzip_body = gzip.compress(body)
+            try:
+                with open(f"{path}.expires") as f:
+                    expiry_time = f.read().strip() or None
+            except FileNotFoundError:
+                expiry_time = None
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.error(f"Error reading snapshot file {path}: {str(e)}")
+            return None
+        
+        cached = CachedResponse(
+            body=body,
+            gzip_body=gzip_body,
+            etag=make_etag(body),
+            last_modified=format_datetime(datetime.fromtimestamp(stat.st_mtime, timezone.utc), usegmt=True),
+            expiry_time=expiry_time
+        )
+        self.loaded[name] = (version, cached)
+        return cached
+    
+    def write(self, name: str, cached: CachedResponse) -> None:
+        """Write a pre-rendered response and its gzip copy, atomically replacing any previous one"""
+        path = self.path(name)
+        if path is None:
+            logger.warning(f"Not writing snapshot file outside {self.directory}: {name}")
+            return
+        
+        mtime = parsedate_to_datetime(cached.last_modified).timestamp() if cached.last_modified else None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # The expiry and gzip copy go first, readers look at the JSON file
+            files = [(f"{path}.gz", cached.gzip_body or gzip.compress(cached.body)), (path, cached.body)]
+            if cached.expiry_time:
+                files.insert(0, (f"{path}.expires", cached.expiry_time.encode()))
+            else:
+                with suppress(FileNotFoundError):
+                    os.remove(f"{path}.expires")
+            for target, content in files:
+                with open(f"{target}.tmp", "wb") as f:
+                    f.write(content)
+                if mtime is not None:
+                    os.utime(f"{target}.tmp", (mtime, mtime))
+                os.replace(f"{target}.tmp", target)
+        except OSError as e:
+            logger.error(f"Error writing snapshot file {path}: {str(e)}")
+    
+    def delete(self, name: str) -> None:
+        """Remove a pre-rendered response"""
+        path = self.path(name)
+        if path is None:
+            return
+        for target in (path, f"{path}.gz", f"{path}.expires"):
+            try:
+                os.remove(target)
+            except FileNotFoundError:
+                pass
+        self.loaded.pop(name, None)
+    
+    def prune_posts(self, slugs: Iterable[str]) -> int:
+        """Remove the posts whose slug is not in `slugs`; returns how many were removed"""
+        keep = set(slugs)
+        try:
+            filenames = os.listdir(os.path.join(self.directory, "posts"))
+        except FileNotFoundError:
+            return 0
+        
+        removed = 0
+        for filename in filenames:
+            if filename.endswith(".json") and filename[:-len(".json")] not in keep:
+                self.delete(f"posts/{filename[:-len('.json')]}")
+                removed += 1
+        return removed
+
+def create_snapshot() -> Optional[Snapshot]:
+    """Create the snapshot configured by SNAPSHOT_DIR, if any"""
+    directory = os.getenv("SNAPSHOT_DIR")
+    if not directory:
+        return None
+    logger.info(f"Using snapshot directory {directory}")
+    return Snapshot(directory)
+
+# Global snapshot, if configured
+snapshot = create_snapshot()
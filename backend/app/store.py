@@ -0,0 +1,100 @@
+import logging
+import os
+import pickle
+import sqlite3
+from typing import Any, Dict, Iterable, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class ContentStore:
+    """SQLite file holding the synced pages between restarts.
+    
+    Each row is keyed by page id and carries the page's `last_edited_time`
+    with its pickled page, listing fields and rendered content, so a
+    restarted process can serve warm content before talking to Notion.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.conn: Optional[sqlite3.Connection] = None
+    
+    def connect(self) -> sqlite3.Connection:
+        """Open the database, creating its tables on first use"""
+        if self.conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Written from worker threads, one at a time
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "page_id TEXT PRIMARY KEY, last_edited_time TEXT, page BLOB, summary BLOB, rendered BLOB)"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.conn.commit()
+        return self.conn
+    
+    def close(self) -> None:
+        """Close the database"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+    
+    def load(self) -> Dict[str, Any]:
+        """Read every saved page and the sync metadata"""
+        conn = self.connect()
+        state = {"pages": {}, "summaries": {}, "rendered": {}}
+        for page_id, page, summary, rendered in conn.execute(
+            "SELECT page_id, page, summary, rendered FROM pages"
+        ):
+            state["pages"][page_id] = pickle.loads(page)
+            if summary is not None:
+                state["summaries"][page_id] = pickle.loads(summary)
+            if rendered is not None:
+                state["rendered"][page_id] = pickle.loads(rendered)
+        state.update(conn.execute("SELECT key, value FROM meta"))
+        return state
+    
+    def save(
+        self,
+        rows: Iterable[Dict[str, Any]],
+        deleted: Iterable[str],
+        meta: Dict[str, Optional[str]]
+    ) -> None:
+        """Write changed pages, drop deleted ones and update the metadata in one transaction"""
+        conn = self.connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        row["page"]["id"],
+                        row["page"].get("last_edited_time"),
+                        pickle.dumps(row["page"]),
+                        pickle.dumps(row["summary"]) if row["summary"] is not None else None,
+                        pickle.dumps(row["rendered"]) if row["rendered"] is not None else None,
+                    )
+                    for row in rows
+                ]
+            )
+            conn.executemany("DELETE FROM pages WHERE page_id = ?", [(page_id,) for page_id in deleted])
+            conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", meta.items())
+    
+    def clear(self) -> None:
+        """Delete everything"""
+        conn = self.connect()
+        with conn:
+            conn.execute("DELETE FROM pages")
+            conn.execute("DELETE FROM meta")
+
+def create_content_store() -> Optional[ContentStore]:
+    """Create the content store configured by CONTENT_STORE_PATH, if any"""
+    path = os.getenv("CONTENT_STORE_PATH")
+    if not path:
+        return None
+    logger.info(f"Using content store at {path}")
+    return ContentStore(path)
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from app.notion.parser import (
+    query_database,
+    parse_page_summaries,
+    parse_page_properties,
+    get_checkbox_from_property,
+)
+from app.store import ContentStore, create_content_store
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Signed file URLs are refreshed this many seconds before they expire, so
+# responses cached from them stay valid for their whole TTL
+EXPIRY_MARGIN = 900
+
+def is_expired(expiry_time: Optional[str], margin: int = EXPIRY_MARGIN) -> bool:
+    """Check whether signed file URLs expiring at `expiry_time` (if any) are about to stop working"""
+    if not expiry_time:
+        return False
+    try:
+        expires = datetime.fromisoformat(expiry_time.replace("Z", "+00:00"))
+    except ValueError:
+        return True
+    return expires <= datetime.now(timezone.utc) + timedelta(seconds=margin)
+
+def earliest_expiry(expiry_times: Iterable[Optional[str]]) -> Optional[str]:
+    """Earliest of several expiry times, ignoring missing ones"""
+    return min((expiry_time for expiry_time in expiry_times if expiry_time), default=None)
+
+# Fields of a listing summary, a subset of a rendered post's
+SUMMARY_FIELDS = ("id", "title", "slug", "date", "excerpt", "cover", "published", "expiry_time")
+
+class ContentSync:
+    """Incrementally synced copy of the published posts.
+    
+    Remembers the newest `last_edited_time` it has seen and only queries
+    Notion for pages edited since then. Listing fields and rendered posts
+    are kept until their page changes, or until the signed URLs of the
+    Notion-hosted files in them expire. Deleted pages never show up in an
+    incremental query, so a full query still runs every
+    `full_sync_interval` seconds.
+    
+    With a `store`, changes are written through to disk and `load()`
+    restores them after a restart.
+    """
+    
+    def __init__(self, full_sync_interval: int = 3600, store: Optional[ContentStore] = None):
+        self.full_sync_interval = full_sync_interval
+        self.store = store
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self.summaries: Dict[str, Dict[str, Any]] = {}
+        self.rendered: Dict[str, Dict[str, Any]] = {}
+        self.watermark: Optional[str] = None
+        self.last_full_sync: Optional[datetime] = None
+        # Page ids changed since the last write to the store
+        self.dirty: Set[str] = set()
+        self.store_lock = asyncio.Lock()
+    
+    async def sync(self) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Bring the published pages up to date; returns (page, summary) pairs in list order"""
+        now = datetime.now()
+        if (
+            self.last_full_sync is None
+            or now - self.last_full_sync > timedelta(seconds=self.full_sync_interval)
+        ):
+            pages = await query_database()
+            logger.info(f"Full sync found {len(pages)} published pages")
+            
+            # Pages missing from a full query were deleted or unpublished
+            for page_id in set(self.pages) - {page["id"] for page in pages}:
+                self.remove_page(page_id)
+            self.last_full_sync = now
+        else:
+            pages = await query_database(edited_since=self.watermark)
+            logger.info(f"Incremental sync found {len(pages)} pages edited since {self.watermark}")
+        
+        for page in pages:
+            self.update_page(page)
+            # Only pages seen in a query advance the watermark; a page
+            # recorded from a webhook says nothing about the pages edited
+            # before it
+            last_edited_time = page.get("last_edited_time", "")
+            if self.watermark is None or last_edited_time > self.watermark:
+                self.watermark = last_edited_time
+        
+        # Parse listing fields only for new or edited pages, and for covers
+        # whose signed URL is about to expire
+        stale_pages = [
+            page for page_id, page in self.pages.items()
+            if page_id not in self.summaries or is_expired(self.summaries[page_id].get("expiry_time"))
+        ]
+        for page, summary in zip(stale_pages, await parse_page_summaries(stale_pages)):
+            self.summaries[page["id"]] = summary
+            self.dirty.add(page["id"])
+        
+        await self.flush()
+        return self.posts()
+    
+    def posts(self) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Get the known (page, summary) pairs in list order, without syncing"""
+        # Keep the database sort order (Date, descending)
+        return sorted(
+            ((page, self.summaries[page_id]) for page_id, page in self.pages.items() if page_id in self.summaries),
+            key=lambda item: item[1]["date"],
+            reverse=True
+        )
+    
+    def update_page(self, page: Dict[str, Any], summary: Optional[Dict[str, Any]] = None) -> None:
+        """Record a page from Notion, dropping its cached summary (unless given) and render if it changed"""
+        page_id = page["id"]
+        last_edited_time = page.get("last_edited_time", "")
+        
+        published = get_checkbox_from_property(page.get("properties", {}).get("Published", {}))
+        if not published or page.get("archived") or page.get("in_trash"):
+            self.remove_page(page_id)
+            return
+        
+        known_page = self.pages.get(page_id)
+        if known_page is not None and known_page.get("last_edited_time") == last_edited_time:
+            return
+        
+        self.pages[page_id] = page
+        if summary is not None:
+            self.summaries[page_id] = summary
+        else:
+            self.summaries.pop(page_id, None)
+        self.rendered.pop(page_id, None)
+        self.dirty.add(page_id)
+    
+    def remove_page(self, page_id: str) -> None:
+        """Forget a deleted or unpublished page"""
+        if page_id in self.pages:
+            self.dirty.add(page_id)
+        self.pages.pop(page_id, None)
+        self.summaries.pop(page_id, None)
+        self.rendered.pop(page_id, None)
+    
+    async def render(self, page: Dict[str, Any]) -> Dict[str, Any]:
+        """Parse a page with its Markdown content, reusing the last render if the page is unchanged"""
+        known_page = self.pages.get(page["id"])
+        if known_page is None or page.get("last_edited_time", "") > known_page.get("last_edited_time", ""):
+            # e.g. from an index another worker synced more recently
+            self.update_page(page)
+        else:
+            page = known_page
+        last_edited_time = page.get("last_edited_time")
+        
+        rendered = self.rendered.get(page["id"])
+        if (
+            rendered is not None
+            and rendered["last_edited_time"] == last_edited_time
+            and not is_expired(rendered["props"].get("expiry_time"))
+        ):
+            logger.info(f"Reusing rendered content for page {page['id']}")
+            return rendered["props"]
+        
+        props = await parse_page_properties(page)
+        if page["id"] in self.pages:
+            self.rendered[page["id"]] = {"last_edited_time": last_edited_time, "props": props}
+            # Keeps the page listed until the next sync parses it again
+            self.summaries.setdefault(page["id"], {key: props[key] for key in SUMMARY_FIELDS if key in props})
+            self.dirty.add(page["id"])
+            await self.flush()
+        return props
+    
+    def load(self) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Restore the pages saved by a previous process; returns (page, summary) pairs in list order"""
+        if self.store is None:
+            return []
+        
+        state = self.store.load()
+        self.pages = state["pages"]
+        self.summaries = state["summaries"]
+        self.rendered = state["rendered"]
+        self.watermark = state.get("watermark")
+        last_full_sync = state.get("last_full_sync")
+        self.last_full_sync = datetime.fromisoformat(last_full_sync) if last_full_sync else None
+        self.dirty.clear()
+        
+        logger.info(f"Loaded {len(self.pages)} pages ({len(self.rendered)} rendered) from the content store")
+        return self.posts()
+    
+    async def flush(self) -> None:
+        """Write pages changed since the last flush to the store"""
+        if self.store is None:
+            return
+        
+        # One write at a time, in the order the changes were made; a flush
+        # queued behind another finds its pages already written
+        async with self.store_lock:
+            if not self.dirty:
+                return
+            dirty = set(self.dirty)
+            self.dirty.clear()
+            rows = [
+                {
+                    "page": self.pages[page_id],
+                    "summary": self.summaries.get(page_id),
+                    "rendered": self.rendered.get(page_id)
+                }
+                for page_id in dirty if page_id in self.pages
+            ]
+            deleted = [page_id for page_id in dirty if page_id not in self.pages]
+            meta = {
+                "watermark": self.watermark,
+                "last_full_sync": self.last_full_sync.isoformat() if self.last_full_sync else None
+            }
+            try:
+                # Pickling and committing would block the event loop
+                await asyncio.to_thread(self.store.save, rows, deleted, meta)
+            except Exception as e:
+                # The store is only a warm start; keep serving from memory
+                # and retry with the next flush
+                self.dirty |= dirty
+                logger.error(f"Error writing to the content store: {str(e)}")
+    
+    async def reset(self) -> None:
+        """Forget everything so the next sync is a full one"""
+        self.pages.clear()
+        self.summaries.clear()
+        self.rendered.clear()
+        self.watermark = None
+        self.last_full_sync = None
+        self.dirty.clear()
+        if self.store is not None:
+            async with self.store_lock:
+                try:
+                    await asyncio.to_thread(self.store.clear)
+                except Exception as e:
+                    logger.error(f"Error clearing the content store: {str(e)}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get sync statistics"""
+        return {
+            "pages": len(self.pages),
+            "rendered_pages": len(self.rendered),
+            "watermark": self.watermark,
+            "last_full_sync": self.last_full_sync.isoformat() if self.last_full_sync else None,
+            "full_sync_interval": self.full_sync_interval,
+            "store": self.store.path if self.store else None
+        }
+
+# Global sync state
+content_sync = ContentSync(
+    full_sync_interval=int(os.getenv("SYNC_FULL_INTERVAL", "3600")),
+    store=create_content_store()
+)
@@ -0,0 +1,211 @@
+"""Tests for the cache backends (Redis tests run against fakeredis)"""
+
+import asyncio
+import pickle
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.cache import SimpleCache, RedisCache, TieredCache, NegativeCache
+from app.models import CachedResponse, PostSummary
+
+
+def fake_redis():
+    """Return an in-process stand-in for a Redis server"""
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeAsyncRedis()
+
+
+def test_simple_cache_evicts_least_recently_used():
+    async def run():
+        cache = SimpleCache(max_entries=2)
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        await cache.get("a")
+        await cache.set("c", 3)
+
+        assert await cache.get("a") == 1
+        assert await cache.get("b") is None
+        assert await cache.get("c") == 3
+        assert cache.evictions == 1
+
+    asyncio.run(run())
+
+
+def test_get_or_set_coalesces_concurrent_misses():
+    async def run():
+        cache = SimpleCache()
+        calls = 0
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(*(cache.get_or_set("key", factory) for _ in range(10)))
+
+        assert calls == 1
+        assert results == [("value", "MISS")] * 10
+        assert await cache.get_or_set("key", factory) == ("value", "HIT")
+
+    asyncio.run(run())
+
+
+def test_get_or_set_serves_stale_value_while_refreshing():
+    async def run():
+        cache = SimpleCache()
+        await cache.set("key", "old", ttl=60, stale_ttl=60)
+        cache.cache["key"]["stale_at"] = datetime.now() - timedelta(seconds=1)
+
+        async def factory():
+            return "new"
+
+        assert await cache.get_or_set("key", factory, ttl=60) == ("old", "STALE")
+        await asyncio.sleep(0)
+        assert await cache.get_or_set("key", factory, ttl=60) == ("new", "HIT")
+
+    asyncio.run(run())
+
+
+def test_refresh_removes_entries_that_no_longer_exist():
+    async def run():
+        cache = SimpleCache()
+        await cache.set("deleted", "deleted post", ttl=60, stale_ttl=60)
+        await cache.set("failing", "post", ttl=60, stale_ttl=60)
+        for key in ("deleted", "failing"):
+            cache.cache[key]["stale_at"] = datetime.now() - timedelta(seconds=1)
+
+        async def deleted():
+            raise HTTPException(status_code=404)
+
+        async def failing():
+            raise HTTPException(status_code=503)
+
+        assert await cache.get_or_set("deleted", deleted, ttl=60) == ("deleted post", "STALE")
+        assert await cache.get_or_set("failing", failing, ttl=60) == ("post", "STALE")
+        await asyncio.sleep(0)
+
+        # A 404 drops the stale copy, any other error keeps serving it
+        assert await cache.get("deleted") is None
+        assert await cache.get_or_set("failing", failing, ttl=60) == ("post", "STALE")
+
+    asyncio.run(run())
+
+
+def test_redis_cache_round_trip_and_clear_pattern():
+    async def run():
+        cache = RedisCache(client=fake_redis(), prefix="test:")
+        await cache.set("post_a", {"title": "A"}, ttl=60)
+        await cache.set("post_b", {"title": "B"}, ttl=60)
+        await cache.set("posts_list", ["a", "b"], ttl=60)
+
+        assert await cache.get("post_a") == {"title": "A"}
+        assert await cache.clear_pattern("post_*") == 2
+        assert await cache.get("post_a") is None
+        assert await cache.get("posts_list") == ["a", "b"]
+
+    asyncio.run(run())
+
+
+def test_redis_cache_stores_responses_and_index_as_json():
+    async def run():
+        client = fake_redis()
+        cache = RedisCache(client=client, prefix="test:")
+        post = CachedResponse(body=b"{}", gzip_body=b"\x1f\x8b", etag='"post"')
+        index = {
+            "posts": [PostSummary(id="1", title="A", slug="a", date="2024-01-01", excerpt="", published=True)],
+            "slugs": {"a": {"id": "1", "last_edited_time": "2024-01-01T00:00:00.000Z"}},
+            "ids": {"1": "a"},
+        }
+        await cache.set("post_a", post, ttl=60)
+        await cache.set("posts_index", index, ttl=60)
+
+        assert await cache.get("post_a") == post
+        assert await cache.get("posts_index") == index
+        assert (await client.get("test:post_a")).startswith(b"{")
+
+    asyncio.run(run())
+
+
+def test_redis_cache_treats_undecodable_entries_as_misses():
+    async def run():
+        client = fake_redis()
+        cache = RedisCache(client=client, prefix="test:")
+        await client.set("test:corrupt", b"not json")
+        await client.set("test:pickled", pickle.dumps({"value": "old"}))
+        await client.set("test:unknown", b'{"value":{"__model__":"Exploit","fields":{}}}')
+
+        for key in ("corrupt", "pickled", "unknown"):
+            assert await cache.get_or_set(key, lambda: asyncio.sleep(0, "new"), ttl=60) == ("new", "MISS")
+
+    asyncio.run(run())
+
+
+def test_tiered_cache_shares_l2_between_workers():
+    async def run():
+        redis = fake_redis()
+        worker_a = TieredCache(SimpleCache(), RedisCache(client=redis), l1_ttl=30)
+        worker_b = TieredCache(SimpleCache(), RedisCache(client=redis), l1_ttl=30)
+
+        async def factory():
+            raise AssertionError("worker b should be served from L2")
+
+        await worker_a.set("posts_list", "posts", ttl=60)
+
+        assert await worker_b.get_or_set("posts_list", factory) == ("posts", "HIT")
+        assert "posts_list" in worker_b.l1.cache
+
+        await worker_b.delete("posts_list")
+        assert await worker_a.l2.get("posts_list") is None
+
+    asyncio.run(run())
+
+
+def test_negative_cache_rejects_misses_and_unknown_slugs():
+    negative_cache = NegativeCache(ttl=60, max_entries=2)
+    negative_cache.add("a")
+    negative_cache.add("b")
+    negative_cache.add("c")
+
+    assert not negative_cache.is_missing("a")
+    assert negative_cache.is_missing("c")
+
+    negative_cache.set_known({"c": {}, "post": {}})
+    assert not negative_cache.is_missing("c")
+    assert not negative_cache.is_missing("post")
+    assert negative_cache.is_missing("unknown")
+
+    negative_cache.clear()
+    assert not negative_cache.is_missing("unknown")
+
+
+def test_stats_count_per_namespace_without_side_effects():
+    async def run():
+        cache = SimpleCache()
+
+        async def factory():
+            return {"title": "A"}
+
+        await cache.get_or_set("post_a", factory)
+        await cache.get_or_set("post_a", factory)
+        await cache.get_or_set("post_b", factory)
+        await cache.get_or_set("posts_list", factory)
+        await cache.set("expired", 1, ttl=60)
+        cache.cache["expired"]["expires_at"] = datetime.now() - timedelta(seconds=1)
+
+        stats = await cache.stats()
+        posts = stats["namespaces"]["post_*"]
+        assert (posts["hits"], posts["misses"], posts["fills"], posts["entries"]) == (1, 2, 2, 2)
+        assert posts["hit_ratio"] == round(1 / 3, 4)
+        assert posts["bytes"] == cache.cache["post_a"]["size"] + cache.cache["post_b"]["size"]
+        assert stats["namespaces"]["posts_list"]["misses"] == 1
+        assert stats["hits"] == 1 and stats["misses"] == 3
+
+        # Reading stats doesn't remove the expired entry
+        assert "expired" in cache.cache
+        assert cache.cleanup_expired() == 1
+        assert (await cache.stats())["namespaces"]["expired"]["expirations"] == 1
+
+    asyncio.run(run())
@@ -0,0 +1,102 @@
+"""Tests for the queued contact email sender (run against a local aiosmtpd server)"""
+
+import asyncio
+import socket
+
+import pytest
+
+from app.email_utils import EmailSender, build_contact_email
+
+
+class RecordingHandler:
+    """aiosmtpd handler that keeps every message and the session it arrived on"""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.content.decode())
+        self.sessions.add(id(session))
+        return "250 Message accepted for delivery"
+
+
+def free_port():
+    """Return a local TCP port nothing is listening on"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_queued_emails_are_sent_over_one_session(monkeypatch):
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+    monkeypatch.setenv("SENDER_EMAIL", "blog@example.com")
+    monkeypatch.setenv("RECEIVER_EMAIL", "owner@example.com")
+    monkeypatch.setenv("EMAIL_HOST", "127.0.0.1")
+    monkeypatch.delenv("GOOGLE_EMAIL_API_PASS", raising=False)
+
+    handler = RecordingHandler()
+    port = free_port()
+    controller = controller_module.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        config = {"sender_email": "blog@example.com", "receiver_email": "owner@example.com"}
+
+        async def run():
+            sender = EmailSender(host="127.0.0.1", port=port, starttls=False)
+            for i in range(5):
+                msg = build_contact_email(f"Reader {i}", f"reader{i}@example.com", "Hello", config)
+                sender.enqueue(config["sender_email"], config["receiver_email"], msg)
+            await sender.stop()
+            return sender
+
+        sender = asyncio.run(run())
+    finally:
+        controller.stop()
+
+    assert sender.sent == 5
+    assert len(handler.messages) == 5
+    assert "Reply-To: reader0@example.com" in handler.messages[0]
+    assert len(handler.sessions) == 1
+
+
+def test_stop_sends_emails_waiting_to_be_retried(monkeypatch):
+    config = {"sender_email": "blog@example.com", "receiver_email": "owner@example.com"}
+
+    async def run():
+        sender = EmailSender()
+        attempts = []
+
+        def send_batch(batch):
+            attempts.extend(batch)
+            # The first attempt fails and is retried after a two second backoff
+            return batch if len(attempts) == 1 else []
+
+        monkeypatch.setattr(sender, "send_batch", send_batch)
+        sender.enqueue(config["sender_email"], config["receiver_email"], build_contact_email("Reader", "reader@example.com", "Hello", config))
+        await asyncio.sleep(0.1)
+        assert sender.stats()["retrying"] == 1
+
+        await asyncio.wait_for(sender.stop(), 1)
+        return attempts, sender
+
+    attempts, sender = asyncio.run(run())
+    assert len(attempts) == 2
+    assert sender.stats()["retrying"] == 0
+    assert sender.failed == 0
+
+
+def test_stop_counts_emails_it_cannot_send(monkeypatch):
+    config = {"sender_email": "blog@example.com", "receiver_email": "owner@example.com"}
+
+    async def run():
+        sender = EmailSender()
+        monkeypatch.setattr(sender, "send_batch", lambda batch: batch)
+        sender.enqueue(config["sender_email"], config["receiver_email"], build_contact_email("Reader", "reader@example.com", "Hello", config))
+        await asyncio.sleep(0.1)
+        await asyncio.wait_for(sender.stop(), 1)
+        return sender
+
+    sender = asyncio.run(run())
+    assert sender.failed == 1
+    assert sender.stats()["retrying"] == 0
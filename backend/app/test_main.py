@@ -0,0 +1,200 @@
+"""Tests for applying Notion webhook events to the cached posts list and index"""
+
+import asyncio
+
+import httpx
+import pytest
+from notion_client import APIErrorCode, APIResponseError
+
+import app.main as main
+import app.sync as sync_module
+from app.cache import SimpleCache
+from app.models import CachedResponse
+from app.search import SearchIndex
+from app.sync import ContentSync
+
+
+def make_page(page_id, slug, date, last_edited_time="2024-01-01T00:00:00.000Z", published=True, database_id="blog-database"):
+    """Return a minimal Notion page from the blog database"""
+    return {
+        "id": page_id,
+        "last_edited_time": last_edited_time,
+        "parent": {"type": "database_id", "database_id": database_id},
+        "properties": {
+            "Title": {"title": [{"text": {"content": slug.title()}}]},
+            "Slug": {"rich_text": [{"text": {"content": slug}}]},
+            "Date": {"date": {"start": date}},
+            "Cover": {"type": "url", "url": "cover.png"},
+            "Published": {"checkbox": published},
+        },
+    }
+
+
+@pytest.fixture
+def notion(monkeypatch):
+    """Serve pages from a dict in place of Notion, with a fresh cache and sync state"""
+    pages = {
+        "page-a": make_page("page-a", "a", "2024-01-02"),
+        "page-b": make_page("page-b", "b", "2024-01-01"),
+    }
+    rendered = []
+
+    async def query_database(page_size=100, edited_since=None):
+        return [
+            page for page in pages.values()
+            if page["properties"]["Published"]["checkbox"]
+            and (edited_since is None or page["last_edited_time"] >= edited_since)
+        ]
+
+    async def get_page(page_id):
+        if page_id not in pages:
+            raise APIResponseError(httpx.Response(404), "Could not find page", APIErrorCode.ObjectNotFound)
+        return pages[page_id]
+
+    async def render_post(slug):
+        rendered.append(slug)
+        return CachedResponse(body=b"{}", etag='"post"')
+
+    monkeypatch.setenv("NOTION_DATABASE_ID", "blog-database")
+    monkeypatch.setattr(sync_module, "query_database", query_database)
+    monkeypatch.setattr(main, "get_page", get_page)
+    monkeypatch.setattr(main, "render_post", render_post)
+    monkeypatch.setattr(main, "cache", SimpleCache())
+    monkeypatch.setattr(main, "content_sync", ContentSync())
+    monkeypatch.setattr(main, "search_index", SearchIndex())
+    monkeypatch.setattr(main, "searched_version", None)
+    return pages, rendered
+
+
+async def cached_slugs():
+    """Slugs of the cached posts list, in list order"""
+    index = await main.cache.get("posts_index")
+    return [post.slug for post in index["posts"]]
+
+
+def test_rename_moves_the_post_to_its_new_slug(notion):
+    pages, rendered = notion
+
+    async def run():
+        await main.build_posts_index()
+        await main.cache.set("post_a", "old render")
+        pages["page-a"] = make_page("page-a", "renamed", "2024-01-02", "2024-02-01T00:00:00.000Z")
+
+        assert await main.apply_page_event("page.properties_updated", "page-a") == {"invalidated": ["a", "renamed"]}
+        assert await cached_slugs() == ["renamed", "b"]
+        assert await main.cache.get("post_a") is None
+        await asyncio.sleep(0)
+        assert rendered == ["renamed"]
+
+    asyncio.run(run())
+
+
+def test_new_post_is_inserted_in_date_order(notion):
+    pages, _ = notion
+
+    async def run():
+        await main.build_posts_index()
+        pages["page-c"] = make_page("page-c", "c", "2024-01-03")
+
+        assert await main.apply_page_event("page.created", "page-c") == {"invalidated": ["c"]}
+        assert await cached_slugs() == ["c", "a", "b"]
+        assert main.search_index.stats()["posts"] == 3
+
+    asyncio.run(run())
+
+
+def test_deleted_and_unpublished_posts_are_removed(notion):
+    pages, _ = notion
+
+    async def run():
+        await main.build_posts_index()
+        pages["page-a"] = make_page("page-a", "a", "2024-01-02", "2024-02-01T00:00:00.000Z", published=False)
+        assert await main.apply_page_event("page.properties_updated", "page-a") == {"invalidated": ["a"]}
+        assert await cached_slugs() == ["b"]
+
+        del pages["page-b"]
+        assert await main.apply_page_event("page.deleted", "page-b") == {"invalidated": ["b"]}
+        assert await cached_slugs() == []
+        assert main.content_sync.pages == {}
+
+    asyncio.run(run())
+
+
+def test_page_missing_from_notion_is_removed(notion):
+    pages, _ = notion
+
+    async def run():
+        await main.build_posts_index()
+        del pages["page-a"]
+
+        assert await main.apply_page_event("page.content_updated", "page-a") == {"invalidated": ["a"]}
+        assert await cached_slugs() == ["b"]
+
+    asyncio.run(run())
+
+
+def test_concurrent_events_keep_each_others_changes(notion, monkeypatch):
+    pages, _ = notion
+    get_page = main.get_page
+
+    async def slow_get_page(page_id):
+        # The first event's page comes back last
+        await asyncio.sleep(0.02 if page_id == "page-a" else 0.01)
+        return await get_page(page_id)
+
+    monkeypatch.setattr(main, "get_page", slow_get_page)
+
+    async def run():
+        await main.build_posts_index()
+        pages["page-a"] = make_page("page-a", "a2", "2024-01-02", "2024-02-01T00:00:00.000Z")
+        pages["page-b"] = make_page("page-b", "b2", "2024-01-01", "2024-02-01T00:00:00.000Z")
+
+        await asyncio.gather(
+            main.apply_page_event("page.properties_updated", "page-a"),
+            main.apply_page_event("page.properties_updated", "page-b"),
+            main.build_posts_index()
+        )
+        assert await cached_slugs() == ["a2", "b2"]
+
+        # A build waiting on an event lists what the event recorded
+        pages["page-a"] = make_page("page-a", "a3", "2024-01-02", "2024-03-01T00:00:00.000Z")
+        await main.apply_page_event("page.properties_updated", "page-a")
+        assert [summary["slug"] for _, summary in main.content_sync.posts()] == ["a3", "b2"]
+
+    asyncio.run(run())
+
+
+def test_pages_from_other_databases_are_ignored(notion):
+    pages, _ = notion
+
+    async def run():
+        await main.build_posts_index()
+        pages["page-x"] = make_page("page-x", "x", "2024-01-03", database_id="other-database")
+
+        assert await main.apply_page_event("page.created", "page-x") == {"invalidated": []}
+        assert await cached_slugs() == ["a", "b"]
+
+    asyncio.run(run())
+
+
+def test_cold_index_falls_back_to_a_full_invalidation(notion):
+    pages, _ = notion
+
+    async def run():
+        await main.build_posts_index()
+        await main.cache.delete("posts_index")
+        del pages["page-a"]
+
+        # A deleted page is forgotten, the rest of the sync state is kept
+        assert await main.apply_page_event("page.deleted", "page-a") == {"invalidated": "all"}
+        assert await main.cache.get("posts_list") is None
+        assert list(main.content_sync.pages) == ["page-b"]
+
+        # Any other event forces the next build to run a full sync
+        pages["page-b"] = make_page("page-b", "b", "2024-01-01", "2024-02-01T00:00:00.000Z", published=False)
+        assert await main.apply_page_event("page.updated", "page-b") == {"invalidated": "all"}
+        assert main.content_sync.last_full_sync is None
+        await main.build_posts_index()
+        assert await cached_slugs() == []
+
+    asyncio.run(run())
@@ -1,14 +1,15 @@
 #!/usr/bin/env python3
 """Test script to verify Notion integration"""
 
+import asyncio
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.notion.client import get_notion, get_database_id
+from app.notion.client import get_notion, get_database_id, close_async_notion
 from app.notion.parser import query_database, parse_page_properties
 
-def test_notion_connection():
+async def check_notion_connection():
     """Test basic Notion connection and database access"""
     try:
         # Test client initialization
@@ -23,14 +24,14 @@ def test_notion_connection():
         
         # Test database query
         print("🔍 Testing database query...")
-        results = query_database()
+        results = await query_database()
         print(f"✅ Database query successful - found {len(results)} pages")
         
         # Test page property parsing
         if results:
             print("🔍 Testing page property parsing...")
             first_page = results[0]
-            parsed_props = parse_page_properties(first_page)
+            parsed_props = await parse_page_properties(first_page)
             print("✅ Page properties parsed successfully:")
             print(f"   Title: {parsed_props.get('title', 'N/A')}")
             print(f"   Slug: {parsed_props.get('slug', 'N/A')}")
@@ -52,6 +53,12 @@ def test_notion_connection():
         print("   3. Ensure the integration has access to the database")
         print("   4. Make sure you have at least one published page")
         return False
+    finally:
+        await close_async_notion()
+
+def test_notion_connection():
+    """Run the Notion checks on a fresh event loop"""
+    return asyncio.run(check_notion_connection())
 
 if __name__ == "__main__":
     test_notion_connection()
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""Tests for the Markdown renderer and its block memo"""
+
+import asyncio
+from types import SimpleNamespace
+
+from app.notion.parser import RenderMemo, extract_rich_text, get_expiry_time, render_blocks_to_markdown
+import app.notion.parser as parser_module
+
+
+def rich_text(content, **annotations):
+    """Return a rich text list holding one run of text"""
+    return [{"type": "text", "text": {"content": content}, "annotations": annotations}]
+
+
+def block(block_id, block_type, data, children=None, edited="2024-01-01T00:00:00.000Z"):
+    """Return a Notion block with its children attached"""
+    result = {"id": block_id, "type": block_type, "last_edited_time": edited, block_type: data}
+    if children:
+        result["children"] = children
+    return result
+
+
+def test_extract_rich_text_nests_annotations_and_links():
+    text = [
+        {"text": {"content": "all"}, "annotations": {"bold": True, "italic": True, "code": True, "strikethrough": True}},
+        {"text": {"content": " link"}, "annotations": {}, "href": "https://example.com"},
+    ]
+
+    assert extract_rich_text(text) == "~~`***all***`~~[ link](https://example.com)"
+
+
+def test_render_reuses_unchanged_blocks_and_rerenders_edited_ones(monkeypatch):
+    memo = RenderMemo()
+    monkeypatch.setattr(parser_module, "render_memo", memo)
+    item = block("item", "paragraph", {"rich_text": rich_text("nested")})
+    blocks = [
+        block("heading", "heading_2", {"rich_text": rich_text("Title")}),
+        block("list", "bulleted_list_item", {"rich_text": rich_text("item", bold=True)}, [item]),
+        block("table", "table", {}, [
+            block("header", "table_row", {"cells": [rich_text("a"), rich_text("b")]}),
+            block("row", "table_row", {"cells": [rich_text("1"), rich_text("2")]}),
+        ]),
+    ]
+
+    expected = "## Title\n\n- **item**\n\n  nested\n\n| a | b |\n| --- | --- |\n| 1 | 2 |"
+    assert render_blocks_to_markdown(blocks) == expected
+    assert render_blocks_to_markdown(blocks) == expected
+    assert memo.hits == memo.misses == 6
+
+    # Editing a nested block re-renders it and its parent only
+    blocks[1]["children"][0] = block("item", "paragraph", {"rich_text": rich_text("edited")}, edited="2024-02-01T00:00:00.000Z")
+    assert render_blocks_to_markdown(blocks) == expected.replace("nested", "edited")
+    assert memo.misses == 8
+
+    # A block edited moments ago isn't memoized yet
+    blocks[0] = block("heading", "heading_2", {"rich_text": rich_text("New")}, edited="2999-01-01T00:00:00.000Z")
+    assert render_blocks_to_markdown(blocks).startswith("## New")
+    assert ("heading", "2999-01-01T00:00:00.000Z") not in memo.entries
+
+
+def test_render_never_reuses_signed_file_urls(monkeypatch):
+    memo = RenderMemo()
+    monkeypatch.setattr(parser_module, "render_memo", memo)
+
+    def image(url):
+        return block("image", "image", {"type": "file", "file": {"url": url, "expiry_time": "2024-01-01T01:00:00.000Z"}, "caption": []})
+
+    blocks = [block("toggle", "toggle", {"rich_text": rich_text("Photo")}, [image("https://files/a.png?sig=1")])]
+    assert "sig=1" in render_blocks_to_markdown(blocks)
+
+    # Same block, same edit time, freshly signed URL
+    blocks[0]["children"][0] = image("https://files/a.png?sig=2")
+    assert "sig=2" in render_blocks_to_markdown(blocks)
+    assert ("image", "2024-01-01T00:00:00.000Z") not in memo.entries
+
+
+def test_fetch_block_tree_skips_children_of_blocks_that_render_nothing(monkeypatch):
+    fetched = []
+
+    async def fetch_blocks_batch(block_ids, concurrency=None):
+        fetched.extend(block_ids)
+        return {block_id: [] for block_id in block_ids}
+
+    monkeypatch.setattr(parser_module, "fetch_blocks_batch", fetch_blocks_batch)
+    blocks = [
+        {"id": "page", "type": "child_page", "has_children": True, "child_page": {}},
+        {"id": "database", "type": "child_database", "has_children": True, "child_database": {}},
+        {"id": "toggle", "type": "toggle", "has_children": True, "toggle": {"rich_text": []}},
+    ]
+
+    asyncio.run(parser_module.fetch_block_tree(blocks, max_depth=8, max_blocks=100))
+    assert fetched == ["toggle"]
+
+
+def test_expiry_time_is_the_earliest_of_notion_hosted_files():
+    blocks = [
+        {"type": "image", "image": {"type": "external", "external": {"url": "a.png"}}},
+        {
+            "type": "toggle",
+            "toggle": {"rich_text": []},
+            "children": [
+                {"type": "image", "image": {"type": "file", "file": {"url": "b.png", "expiry_time": "2024-01-01T02:00:00.000Z"}}},
+                {"type": "file", "file": {"type": "file", "file": {"url": "c.pdf", "expiry_time": "2024-01-01T01:00:00.000Z"}}},
+            ],
+        },
+    ]
+    cover = {"files": [{"name": "cover.png", "type": "file", "file": {"url": "d.png", "expiry_time": "2024-01-01T03:00:00.000Z"}}]}
+
+    assert get_expiry_time(blocks) == "2024-01-01T01:00:00.000Z"
+    assert get_expiry_time([cover, blocks[:1]]) == "2024-01-01T03:00:00.000Z"
+    assert get_expiry_time(blocks[:1]) is None
+
+
+class PaginatedEndpoint:
+    """Stand-in for a paginated Notion endpoint that records its calls"""
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    async def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        start = int(kwargs.get("start_cursor") or 0)
+        end = start + kwargs["page_size"]
+        return {
+            "results": self.results[start:end],
+            "next_cursor": str(end) if end < len(self.results) else None,
+            "has_more": end < len(self.results),
+        }
+
+
+def stub_notion(monkeypatch, pages=(), blocks=()):
+    """Replace the Notion client with paginated stand-ins for the database query and block children"""
+    notion = SimpleNamespace(
+        databases=SimpleNamespace(query=PaginatedEndpoint(list(pages))),
+        blocks=SimpleNamespace(children=SimpleNamespace(list=PaginatedEndpoint(list(blocks)))),
+    )
+    monkeypatch.setattr(parser_module, "get_async_notion", lambda: notion)
+    monkeypatch.setattr(parser_module, "get_database_id", lambda: "database")
+    return notion
+
+
+def test_query_database_follows_cursors_past_the_first_page(monkeypatch):
+    notion = stub_notion(monkeypatch, pages=[{"id": f"page-{i}"} for i in range(250)])
+
+    pages = asyncio.run(parser_module.query_database())
+    assert [page["id"] for page in pages] == [f"page-{i}" for i in range(250)]
+    calls = notion.databases.query.calls
+    assert [call.get("start_cursor") for call in calls] == [None, "100", "200"]
+    assert {call["page_size"] for call in calls} == {100}
+    assert {call["database_id"] for call in calls} == {"database"}
+
+
+def test_block_children_follow_cursors_with_the_given_page_size(monkeypatch):
+    notion = stub_notion(monkeypatch, blocks=[{"id": f"block-{i}"} for i in range(5)])
+
+    blocks = asyncio.run(parser_module.get_block_children("parent", page_size=2))
+    assert [block["id"] for block in blocks] == [f"block-{i}" for i in range(5)]
+    calls = notion.blocks.children.list.calls
+    assert [call.get("start_cursor") for call in calls] == [None, "2", "4"]
+    assert {call["page_size"] for call in calls} == {2}
+    assert {call["block_id"] for call in calls} == {"parent"}
+
+
+def test_fetch_blocks_batch_dedupes_ids_and_limits_concurrency(monkeypatch):
+    calls = []
+    in_flight = 0
+    peak = 0
+
+    async def get_block_children(block_id, page_size=100):
+        nonlocal in_flight, peak
+        calls.append(block_id)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return [{"id": f"{block_id}-child"}]
+
+    monkeypatch.setattr(parser_module, "get_block_children", get_block_children)
+    block_ids = ["a", "b", "a", "c", "d", "b", "e"]
+
+    children = asyncio.run(parser_module.fetch_blocks_batch(block_ids, concurrency=2))
+    assert sorted(calls) == ["a", "b", "c", "d", "e"]
+    assert peak == 2
+    assert children == {block_id: [{"id": f"{block_id}-child"}] for block_id in "abcde"}
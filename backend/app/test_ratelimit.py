@@ -0,0 +1,28 @@
+"""Tests for the token bucket rate limiters"""
+
+import asyncio
+
+import pytest
+
+from app.ratelimit import RateLimiter, RateLimitExceeded, TokenBucket
+
+
+def test_rate_limiter_allows_a_burst_per_client():
+    limiter = RateLimiter(requests=3, period=60)
+
+    assert [limiter.check("a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.check("a") > 0
+    assert limiter.check("b") == 0
+    assert limiter.limited == 1
+
+
+def test_token_bucket_queues_then_sheds():
+    async def run():
+        bucket = TokenBucket(rate=100, capacity=1)
+        await bucket.acquire(timeout=1)
+        await bucket.acquire(timeout=1)  # waits ~10ms for the next token
+
+        with pytest.raises(RateLimitExceeded):
+            await bucket.acquire(timeout=0)
+
+    asyncio.run(run())
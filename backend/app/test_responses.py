@@ -0,0 +1,73 @@
+"""Tests for cached response serialization and conditional requests"""
+
+from typing import List
+
+from fastapi import Request
+from pydantic import BaseModel
+
+from app.responses import cached_json_response, gzip_etag, render_cached_response
+
+
+class Body(BaseModel):
+    items: List[str]
+
+
+def request(**headers: str) -> Request:
+    """Build a GET request carrying the given headers"""
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    })
+
+
+def test_if_none_match_returns_not_modified():
+    cached = render_cached_response(Body(items=["a"]))
+
+    response = cached_json_response(request(if_none_match=cached.etag), cached, {})
+    assert response.status_code == 304
+    assert response.headers["etag"] == cached.etag
+
+    response = cached_json_response(request(if_none_match='"other"'), cached, {})
+    assert response.status_code == 200
+    assert response.body == cached.body
+
+
+def test_gzip_etag_matches_either_representation():
+    cached = render_cached_response(Body(items=["x" * 2000]))
+    assert cached.gzip_body is not None
+
+    response = cached_json_response(request(accept_encoding="gzip"), cached, {})
+    assert response.headers["etag"] == gzip_etag(cached.etag)
+    assert response.headers["content-encoding"] == "gzip"
+
+    response = cached_json_response(request(if_none_match=f"W/{gzip_etag(cached.etag)}"), cached, {})
+    assert response.status_code == 304
+
+
+def test_if_modified_since_uses_last_edited_time():
+    cached = render_cached_response(Body(items=["a"]), "2024-05-01T10:00:00.000Z")
+    assert cached.last_modified == "Wed, 01 May 2024 10:00:00 GMT"
+
+    response = cached_json_response(request(if_modified_since="Wed, 01 May 2024 10:00:00 GMT"), cached, {})
+    assert response.status_code == 304
+    assert response.headers["last-modified"] == cached.last_modified
+
+    response = cached_json_response(request(if_modified_since="Tue, 30 Apr 2024 10:00:00 GMT"), cached, {})
+    assert response.status_code == 200
+
+    # If-None-Match takes precedence over If-Modified-Since
+    response = cached_json_response(
+        request(if_none_match='"other"', if_modified_since="Wed, 01 May 2024 10:00:00 GMT"), cached, {}
+    )
+    assert response.status_code == 200
+
+
+def test_without_last_modified_only_the_etag_validates():
+    cached = render_cached_response(Body(items=["a"]))
+    assert cached.last_modified is None
+
+    response = cached_json_response(request(if_modified_since="Wed, 01 May 2030 10:00:00 GMT"), cached, {})
+    assert response.status_code == 200
+    assert "last-modified" not in response.headers
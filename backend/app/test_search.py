@@ -0,0 +1,64 @@
+"""Tests for the search index"""
+
+from app.search import SearchIndex
+
+
+def summary(slug, title, excerpt=""):
+    """Return a minimal post summary"""
+    return {"id": slug, "slug": slug, "title": title, "excerpt": excerpt}
+
+
+def test_search_ranks_and_paginates_matches_of_every_term():
+    index = SearchIndex()
+    index.add("a", summary("a", "Caching with Redis"), "v1", "How the cache talks to Redis.")
+    index.add("b", summary("b", "Notion as a CMS"), "v1", "Pages are cached, and Redis is optional.")
+    index.add("c", summary("c", "Contact form"), "v1", "Emails go through SMTP.")
+
+    total, results = index.search("redis")
+    assert total == 2
+    # A match in the title outranks one in the content
+    assert [result["slug"] for result in results] == ["a", "b"]
+    assert results[0]["score"] > results[1]["score"]
+
+    assert index.search("REDIS optional")[1][0]["slug"] == "b"
+    assert index.search("redis smtp") == (0, [])
+    assert index.search("redis", limit=1, offset=1) == (2, [results[1]])
+
+
+def test_search_updates_posts_incrementally():
+    index = SearchIndex()
+    index.add("a", summary("a", "First"), "v1", "original words")
+    index.add("b", summary("b", "Second"), "v1")
+
+    # A new version without content keeps the old content until re-rendered
+    index.add("a", summary("a", "Renamed"), "v2")
+    assert index.search("first") == (0, [])
+    assert index.search("renamed original")[0] == 1
+
+    index.add("a", summary("a", "Renamed"), "v2", "rewritten words")
+    assert index.search("original") == (0, [])
+    assert index.search("rewritten")[0] == 1
+
+    assert index.retain(["b"]) == 1
+    assert index.search("words") == (0, [])
+    assert index.stats() == {"posts": 1, "posts_with_content": 0, "terms": 1}
+
+
+def test_posts_with_content_counts_current_renders_only():
+    index = SearchIndex()
+    index.add("a", summary("a", "Caching"), "v1", "Redis")
+    index.add("b", summary("b", "Notion"), "v1")
+    assert index.stats()["posts_with_content"] == 1
+
+    # An edit keeps the old content searchable but no longer current
+    index.add("a", summary("a", "Caching"), "v2")
+    assert index.stats()["posts_with_content"] == 0
+
+    index.add("a", summary("a", "Caching"), "v2", "Redis and more")
+    index.add("b", summary("b", "Notion"), "v1", "Pages")
+    assert index.stats()["posts_with_content"] == 2
+
+    index.remove("b")
+    assert index.stats()["posts_with_content"] == 1
+    index.clear()
+    assert index.stats()["posts_with_content"] == 0
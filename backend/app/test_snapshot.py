@@ -0,0 +1,87 @@
+"""Tests for the static snapshot of pre-rendered responses"""
+
+import gzip
+import os
+from typing import List
+
+from pydantic import BaseModel
+
+from app.responses import render_cached_response
+from app.snapshot import Snapshot
+
+
+class Body(BaseModel):
+    items: List[str]
+
+
+def test_write_and_read_round_trip(tmp_path):
+    snapshot = Snapshot(str(tmp_path))
+    post = render_cached_response(Body(items=["x" * 2000]), "2024-05-01T10:00:00.000Z")
+    snapshot.write("posts/a", post)
+
+    assert sorted(os.listdir(tmp_path / "posts")) == ["a.json", "a.json.gz"]
+    # The mtime is the post's last edit, for static file servers
+    assert os.stat(tmp_path / "posts" / "a.json").st_mtime == 1714557600
+
+    read = Snapshot(str(tmp_path)).read("posts/a")
+    assert read.body == post.body
+    assert gzip.decompress(read.gzip_body) == post.body
+    assert read.etag == post.etag
+    assert read.last_modified == "Wed, 01 May 2024 10:00:00 GMT"
+    assert snapshot.read("posts/missing") is None
+
+
+def test_rewritten_file_is_read_again_even_with_the_same_mtime_and_size(tmp_path):
+    snapshot = Snapshot(str(tmp_path))
+    snapshot.write("posts/a", render_cached_response(Body(items=["sig=1"]), "2024-05-01T10:00:00.000Z"))
+    assert b"sig=1" in snapshot.read("posts/a").body
+
+    snapshot.write("posts/a", render_cached_response(Body(items=["sig=2"]), "2024-05-01T10:00:00.000Z"))
+    assert b"sig=2" in snapshot.read("posts/a").body
+
+
+def test_expiry_time_is_kept_next_to_the_file(tmp_path):
+    snapshot = Snapshot(str(tmp_path))
+    snapshot.write("posts/a", render_cached_response(Body(items=["a"]), expiry_time="2024-05-01T11:00:00.000Z"))
+    assert Snapshot(str(tmp_path)).read("posts/a").expiry_time == "2024-05-01T11:00:00.000Z"
+
+    # Re-rendered without Notion-hosted files
+    snapshot.write("posts/a", render_cached_response(Body(items=["b"])))
+    assert Snapshot(str(tmp_path)).read("posts/a").expiry_time is None
+    assert not os.path.exists(tmp_path / "posts" / "a.json.expires")
+
+
+def test_missing_gzip_copy_is_rebuilt(tmp_path):
+    snapshot = Snapshot(str(tmp_path))
+    post = render_cached_response(Body(items=["x" * 2000]))
+    snapshot.write("posts/a", post)
+    os.remove(tmp_path / "posts" / "a.json.gz")
+
+    read = Snapshot(str(tmp_path)).read("posts/a")
+    assert gzip.decompress(read.gzip_body) == post.body
+
+
+def test_paths_outside_the_directory_are_rejected(tmp_path):
+    snapshot = Snapshot(str(tmp_path / "snapshot"))
+    (tmp_path / "secret.json").write_text("{}")
+
+    assert snapshot.path("../secret") is None
+    assert snapshot.path("posts/../../secret") is None
+    assert snapshot.read("../secret") is None
+
+    snapshot.write("../evil", render_cached_response(Body(items=[])))
+    assert not os.path.exists(tmp_path / "evil.json")
+
+
+def test_prune_posts_removes_posts_not_kept(tmp_path):
+    snapshot = Snapshot(str(tmp_path))
+    for slug in ("a", "b", "c"):
+        snapshot.write(f"posts/{slug}", render_cached_response(Body(items=[slug]), expiry_time="2024-05-01T11:00:00.000Z"))
+    snapshot.write("posts", render_cached_response(Body(items=["a", "b", "c"])))
+
+    assert snapshot.prune_posts(["a", "c"]) == 1
+    assert sorted(os.listdir(tmp_path / "posts")) == [
+        "a.json", "a.json.expires", "a.json.gz", "c.json", "c.json.expires", "c.json.gz"
+    ]
+    assert snapshot.read("posts") is not None
+    assert Snapshot(str(tmp_path)).prune_posts([]) == 2
@@ -0,0 +1,164 @@
+"""Tests for the incremental content sync and its on-disk store"""
+
+import asyncio
+import sqlite3
+import threading
+
+import app.sync as sync_module
+from app.store import ContentStore
+from app.sync import ContentSync
+
+
+def make_page(page_id, last_edited_time, published=True):
+    """Return a minimal Notion page"""
+    return {
+        "id": page_id,
+        "last_edited_time": last_edited_time,
+        "properties": {
+            "Title": {"title": [{"text": {"content": page_id.upper()}}]},
+            "Slug": {"rich_text": [{"text": {"content": page_id}}]},
+            "Date": {"date": {"start": "2024-01-01"}},
+            "Cover": {"type": "url", "url": "cover.png"},
+            "Published": {"checkbox": published},
+        },
+    }
+
+
+def test_sync_fetches_only_edited_pages_and_restores_from_store(tmp_path, monkeypatch):
+    pages = {"a": make_page("a", "2024-01-01T00:00:00.000Z"), "b": make_page("b", "2024-01-01T00:00:00.000Z")}
+    queries = []
+
+    async def query_database(page_size=100, edited_since=None):
+        queries.append(edited_since)
+        return [page for page in pages.values() if edited_since is None or page["last_edited_time"] >= edited_since]
+
+    monkeypatch.setattr(sync_module, "query_database", query_database)
+
+    async def run():
+        content_sync = ContentSync(store=ContentStore(str(tmp_path / "content.db")))
+        assert [page["id"] for page, _ in await content_sync.sync()] == ["a", "b"]
+
+        pages["b"] = make_page("b", "2024-02-01T00:00:00.000Z", published=False)
+        assert [page["id"] for page, _ in await content_sync.sync()] == ["a"]
+        assert queries == [None, "2024-01-01T00:00:00.000Z"]
+
+        restored = ContentSync(store=ContentStore(str(tmp_path / "content.db")))
+        assert [summary["slug"] for _, summary in restored.load()] == ["a"]
+        assert restored.watermark == "2024-02-01T00:00:00.000Z"
+
+    asyncio.run(run())
+
+
+def test_pages_recorded_outside_a_query_do_not_advance_the_watermark(monkeypatch):
+    pages = {"a": make_page("a", "2024-01-01T00:00:00.000Z")}
+    queries = []
+
+    async def query_database(page_size=100, edited_since=None):
+        queries.append(edited_since)
+        return [page for page in pages.values() if edited_since is None or page["last_edited_time"] >= edited_since]
+
+    monkeypatch.setattr(sync_module, "query_database", query_database)
+
+    async def run():
+        content_sync = ContentSync()
+        await content_sync.sync()
+
+        # A webhook records b, edited after c, which has not been synced yet
+        pages["c"] = make_page("c", "2024-02-01T00:00:00.000Z")
+        pages["b"] = make_page("b", "2024-03-01T00:00:00.000Z")
+        content_sync.update_page(pages["b"])
+        assert content_sync.watermark == "2024-01-01T00:00:00.000Z"
+
+        assert [page["id"] for page, _ in await content_sync.sync()] == ["a", "b", "c"]
+        assert queries == [None, "2024-01-01T00:00:00.000Z"]
+        assert content_sync.watermark == "2024-03-01T00:00:00.000Z"
+
+    asyncio.run(run())
+
+
+def test_renders_with_expiring_file_urls_are_refreshed(monkeypatch):
+    expiry_times = iter(["2000-01-01T00:00:00.000Z", "2999-01-01T00:00:00.000Z"])
+    renders = []
+
+    async def parse_page_properties(page):
+        renders.append(page["id"])
+        return {"content": "", "expiry_time": next(expiry_times)}
+
+    monkeypatch.setattr(sync_module, "parse_page_properties", parse_page_properties)
+
+    async def run():
+        content_sync = ContentSync()
+        page = make_page("a", "2024-01-01T00:00:00.000Z")
+        content_sync.update_page(page)
+
+        # The first render links to a file URL that has already expired
+        await content_sync.render(page)
+        await content_sync.render(page)
+        await content_sync.render(page)
+        assert renders == ["a", "a"]
+
+    asyncio.run(run())
+
+
+def test_render_prefers_the_newer_copy_of_a_page(monkeypatch):
+    renders = []
+
+    async def parse_page_properties(page):
+        renders.append(page["last_edited_time"])
+        return {"slug": page["id"], "date": "2024-01-01", "content": page["last_edited_time"]}
+
+    monkeypatch.setattr(sync_module, "parse_page_properties", parse_page_properties)
+
+    async def run():
+        content_sync = ContentSync()
+        content_sync.update_page(make_page("a", "2024-01-01T00:00:00.000Z"))
+        await content_sync.render(make_page("a", "2024-01-01T00:00:00.000Z"))
+
+        # Another worker synced an edit this one hasn't seen
+        props = await content_sync.render(make_page("a", "2024-02-01T00:00:00.000Z"))
+        assert props["content"] == "2024-02-01T00:00:00.000Z"
+        assert content_sync.pages["a"]["last_edited_time"] == "2024-02-01T00:00:00.000Z"
+        # ...and the page stays listed
+        assert [summary["slug"] for _, summary in content_sync.posts()] == ["a"]
+
+        # An older copy still gets the newer render
+        props = await content_sync.render(make_page("a", "2024-01-01T00:00:00.000Z"))
+        assert props["content"] == "2024-02-01T00:00:00.000Z"
+        assert renders == ["2024-01-01T00:00:00.000Z", "2024-02-01T00:00:00.000Z"]
+
+    asyncio.run(run())
+
+
+def test_store_is_written_off_the_event_loop_and_retried_after_errors(tmp_path, monkeypatch):
+    pages = {"a": make_page("a", "2024-01-01T00:00:00.000Z")}
+
+    async def query_database(page_size=100, edited_since=None):
+        return list(pages.values())
+
+    monkeypatch.setattr(sync_module, "query_database", query_database)
+
+    store = ContentStore(str(tmp_path / "content.db"))
+    save = store.save
+    threads = []
+
+    def failing_save(rows, deleted, meta):
+        threads.append(threading.get_ident())
+        raise sqlite3.OperationalError("disk I/O error")
+
+    async def run():
+        content_sync = ContentSync(store=store)
+        monkeypatch.setattr(store, "save", failing_save)
+        await content_sync.sync()
+        assert threads and threads[0] != threading.get_ident()
+        assert content_sync.dirty == {"a"}
+
+        # The pages the failed write held are written with the next one
+        monkeypatch.setattr(store, "save", save)
+        await content_sync.flush()
+        assert content_sync.dirty == set()
+        assert [summary["slug"] for _, summary in ContentSync(store=ContentStore(store.path)).load()] == ["a"]
+
+        await content_sync.reset()
+        assert ContentSync(store=ContentStore(store.path)).load() == []
+
+    asyncio.run(run())
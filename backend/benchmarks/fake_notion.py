@@ -0,0 +1,222 @@
+"""Local fake of the parts of the Notion API the blog uses.
+
+Serves a generated database of `posts` published pages, each with
+`blocks` top-level blocks (headings, paragraphs, nested lists, code,
+quotes, toggles holding tables and plain tables), over the same REST
+endpoints as api.notion.com:
+
+    POST /v1/databases/{id}/query
+    GET  /v1/pages/{id}
+    GET  /v1/blocks/{id}/children
+
+Every request can be delayed by `latency` seconds, and every
+`rate_limit_every`-th request answered with Notion's 429 error.
+"""
+
+import asyncio
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+def rich_text(content: str, **annotations: bool) -> List[Dict[str, Any]]:
+    """Notion rich text holding one run of text"""
+    return [{"type": "text", "text": {"content": content}, "annotations": annotations, "plain_text": content}]
+
+class FakeNotion:
+    """Generated Notion workspace with call counters, latency and 429 injection"""
+    
+    def __init__(
+        self,
+        posts: int = 20,
+        blocks: int = 50,
+        table_rows: int = 5,
+        latency: float = 0.0,
+        rate_limit_every: int = 0,
+        database_id: str = "fake-database"
+    ):
+        self.database_id = database_id
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.table_rows = table_rows
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self.children: Dict[str, List[Dict[str, Any]]] = {}
+        self.calls: Counter = Counter()
+        self.requests = 0
+        self.rate_limited = 0
+        self.next_id = 0
+        
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for number in range(posts):
+            page_id = self.new_id()
+            edited = (start + timedelta(hours=number)).isoformat().replace("+00:00", ".000Z")
+            self.pages[page_id] = {
+                "object": "page",
+                "id": page_id,
+                "parent": {"type": "database_id", "database_id": database_id},
+                "created_time": edited,
+                "last_edited_time": edited,
+                "archived": False,
+                "in_trash": False,
+                "properties": {
+                    "Title": {"type": "title", "title": rich_text(f"Post {number}")},
+                    "Slug": {"type": "rich_text", "rich_text": rich_text(f"post-{number}")},
+                    "Date": {"type": "date", "date": {"start": (start + timedelta(days=number)).date().isoformat()}},
+                    "Excerpt": {"type": "rich_text", "rich_text": rich_text(f"Excerpt of post {number}")},
+                    "Cover": {"type": "url", "url": f"https://example.com/covers/{number}.png"},
+                    "Published": {"type": "checkbox", "checkbox": True},
+                },
+            }
+            self.children[page_id] = [self.make_block(index) for index in range(blocks)]
+    
+    def new_id(self) -> str:
+        """Next UUID-shaped object id"""
+        self.next_id += 1
+        return f"00000000-0000-4000-8000-{self.next_id:012d}"
+    
+    def block(self, block_type: str, data: Dict[str, Any], children: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Create a block, registering its children"""
+        block_id = self.new_id()
+        if children:
+            self.children[block_id] = children
+        return {
+            "object": "block",
+            "id": block_id,
+            "type": block_type,
+            "has_children": bool(children),
+            "last_edited_time": "2024-01-01T00:00:00.000Z",
+            block_type: data,
+        }
+    
+    def table(self) -> Dict[str, Any]:
+        """A three-column table with a header row"""
+        rows = [
+            self.block("table_row", {"cells": [rich_text(f"r{row}c{column}") for column in range(3)]})
+            for row in range(self.table_rows + 1)
+        ]
+        return self.block("table", {"table_width": 3, "has_column_header": True, "has_row_header": False}, rows)
+    
+    def make_block(self, index: int) -> Dict[str, Any]:
+        """The `index`-th top-level block of a post, cycling through the supported block types"""
+        text = f"Block {index} with some **markdown-worthy** text that makes a paragraph of realistic length."
+        kind = index % 10
+        if kind == 0:
+            return self.block("heading_2", {"rich_text": rich_text(f"Section {index}"), "is_toggleable": False})
+        if kind == 4:
+            nested = [self.block("bulleted_list_item", {"rich_text": rich_text("Nested item")})]
+            return self.block("bulleted_list_item", {"rich_text": rich_text(text)}, nested)
+        if kind == 5:
+            return self.block("numbered_list_item", {"rich_text": rich_text(text)})
+        if kind == 6:
+            return self.block("code", {"rich_text": rich_text("print('hello')"), "language": "python"})
+        if kind == 7:
+            return self.block("quote", {"rich_text": rich_text(text, italic=True)})
+        if kind == 8:
+            inner = [self.block("paragraph", {"rich_text": rich_text(text)}), self.table()]
+            return self.block("toggle", {"rich_text": rich_text(f"Details {index}")}, inner)
+        if kind == 9:
+            return self.table()
+        return self.block("paragraph", {"rich_text": rich_text(text, bold=kind == 3)})
+    
+    def paginate(self, results: List[Dict[str, Any]], start_cursor: Optional[str], page_size: int) -> Dict[str, Any]:
+        """Notion list response for one page of `results`"""
+        start = int(start_cursor or 0)
+        end = start + min(page_size, 100)
+        return {
+            "object": "list",
+            "results": results[start:end],
+            "next_cursor": str(end) if end < len(results) else None,
+            "has_more": end < len(results),
+        }
+    
+    def app(self) -> FastAPI:
+        """ASGI app serving this workspace"""
+        app = FastAPI()
+        
+        @app.middleware("http")
+        async def inject_faults(request: Request, call_next):
+            self.requests += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.rate_limit_every and self.requests % self.rate_limit_every == 0:
+                self.rate_limited += 1
+                return JSONResponse(
+                    status_code=429,
+                    content={"object": "error", "status": 429, "code": "rate_limited", "message": "Rate limited"},
+                    headers={"Retry-After": "1"}
+                )
+            return await call_next(request)
+        
+        @app.post("/v1/databases/{database_id}/query")
+        async def query_database(database_id: str, request: Request):
+            self.calls["databases.query"] += 1
+            body = await request.json()
+            pages = list(self.pages.values())
+            
+            # The incremental sync filters on last_edited_time
+            edited_since = body.get("filter", {}).get("last_edited_time", {}).get("on_or_after")
+            if edited_since:
+                pages = [page for page in pages if page["last_edited_time"] >= edited_since]
+            pages.sort(key=lambda page: page["properties"]["Date"]["date"]["start"], reverse=True)
+            return self.paginate(pages, body.get("start_cursor"), body.get("page_size", 100))
+        
+        @app.get("/v1/pages/{page_id}")
+        async def retrieve_page(page_id: str):
+            self.calls["pages.retrieve"] += 1
+            if page_id not in self.pages:
+                return JSONResponse(
+                    status_code=404,
+                    content={"object": "error", "status": 404, "code": "object_not_found", "message": "Not found"}
+                )
+            return self.pages[page_id]
+        
+        @app.get("/v1/blocks/{block_id}/children")
+        async def list_children(block_id: str, start_cursor: Optional[str] = None, page_size: int = 100):
+            self.calls["blocks.children.list"] += 1
+            return self.paginate(self.children.get(block_id, []), start_cursor, page_size)
+        
+        return app
+    
+    def reset_counters(self) -> None:
+        """Zero the call counters"""
+        self.calls.clear()
+        self.requests = 0
+        self.rate_limited = 0
+
+@contextmanager
+def serve(fake: FakeNotion, port: int = 0) -> Iterator[str]:
+    """Run the fake on a local port in a background thread; yields its base URL"""
+    server = uvicorn.Server(uvicorn.Config(fake.app(), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Fake Notion server failed to start")
+        time.sleep(0.01)
+    
+    try:
+        port = server.servers[0].sockets[0].getsockname()[1]
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Serve a fake Notion workspace")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--posts", type=int, default=20)
+    parser.add_argument("--blocks", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    args = parser.parse_args()
+    
+    fake = FakeNotion(args.posts, args.blocks, latency=args.latency, rate_limit_every=args.rate_limit_every)
+    uvicorn.run(fake.app(), host="127.0.0.1", port=args.port)
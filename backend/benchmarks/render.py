@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks of the Markdown renderer on a synthetic long post.
+
+Usage: python -m benchmarks.render [--blocks 5000] [--repeat 20]
+
+Renders the block tree of one post built by the fake Notion server:
+without the block memo, from scratch (empty memo), unchanged (every
+block memoized) and after editing one paragraph, plus the rich text
+conversion on its own.
+"""
+
+import argparse
+import copy
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_notion import FakeNotion
+from app.notion.parser import extract_rich_text, render_blocks_to_markdown, render_memo
+
+def synthetic_post(blocks: int, table_rows: int = 5) -> List[Dict[str, Any]]:
+    """Block tree of one generated post, children attached as fetch_block_tree does"""
+    fake = FakeNotion(posts=1, blocks=blocks, table_rows=table_rows)
+    
+    def attach(block: Dict[str, Any]) -> Dict[str, Any]:
+        if block["has_children"]:
+            block["children"] = [attach(child) for child in fake.children[block["id"]]]
+        return block
+    
+    page_id = next(iter(fake.pages))
+    return [attach(block) for block in copy.deepcopy(fake.children[page_id])]
+
+def rich_text_lists(blocks: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Every rich text list in a block tree, table cells included"""
+    lists = []
+    for block in blocks:
+        data = block[block["type"]]
+        if "rich_text" in data:
+            lists.append(data["rich_text"])
+        lists.extend(data.get("cells", []))
+        lists.extend(rich_text_lists(block.get("children", [])))
+    return lists
+
+def edit_paragraph(blocks: List[Dict[str, Any]], number: int) -> None:
+    """Change the text and last_edited_time of one paragraph, like an edit in Notion"""
+    paragraph = [block for block in blocks if block["type"] == "paragraph"][0]
+    paragraph["paragraph"]["rich_text"][0]["text"]["content"] = f"Edited paragraph, revision {number}."
+    paragraph["last_edited_time"] = f"2024-06-01T00:{number // 60 % 60:02d}:{number % 60:02d}.000Z"
+
+def timed(fn: Callable[[], Any], before_each: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Run fn `repeat` times; returns its median and best time in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        before_each()
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": round(statistics.median(times), 3), "best_ms": round(min(times), 3)}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Markdown renderer on a synthetic post")
+    parser.add_argument("--blocks", type=int, default=5000, help="top-level blocks in the post")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per scenario")
+    args = parser.parse_args()
+    
+    blocks = synthetic_post(args.blocks)
+    lists = rich_text_lists(blocks)
+    edits = iter(range(1, 10 ** 6))
+    
+    render_memo.max_entries = 0
+    results = {"render_no_memo": timed(lambda: render_blocks_to_markdown(blocks), lambda: None, args.repeat)}
+    render_memo.max_entries = 10 * args.blocks
+    results.update({
+        "render_cold": timed(lambda: render_blocks_to_markdown(blocks), render_memo.clear, args.repeat),
+        "render_unchanged": timed(lambda: render_blocks_to_markdown(blocks), lambda: None, args.repeat),
+        "render_one_edit": timed(
+            lambda: render_blocks_to_markdown(blocks), lambda: edit_paragraph(blocks, next(edits)), args.repeat
+        ),
+        "extract_rich_text": timed(lambda: [extract_rich_text(rich_text) for rich_text in lists], lambda: None, args.repeat),
+    })
+    
+    print(f"{args.blocks} top-level blocks, {len(render_memo.entries)} memoized blocks, {len(lists)} rich text lists")
+    for name, metrics in results.items():
+        print(f"{name:18} median {metrics['median_ms']:9.3f}ms  best {metrics['best_ms']:9.3f}ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Benchmark /posts and /posts/{slug} against a local fake Notion server.
+
+Usage: python -m benchmarks.run [--posts 20] [--blocks 50] [--latency 0.02]
+       [--output benchmark-results.json] [--baseline previous.json]
+
+Measures cold and warm latency, throughput under concurrency and the
+Notion calls each scenario makes, and writes the results as JSON. With
+--baseline, exits non-zero if a scenario makes more Notion calls per
+request, or its median latency grew by more than --tolerance.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_notion import FakeNotion, serve
+
+def configure_environment(base_url: str, notion_rate: float) -> None:
+    """Point the app at the fake server, in memory only, before it is imported"""
+    os.environ.update(
+        NOTION_API_KEY="fake-key",
+        NOTION_DATABASE_ID="fake-database",
+        NOTION_BASE_URL=base_url,
+        NOTION_RATE_LIMIT=str(notion_rate),
+        NOTION_RATE_BURST=str(notion_rate),
+        CACHE_BACKEND="memory",
+        CACHE_WARMUP="false",
+        RATE_LIMIT_POST="0",
+        RATE_LIMIT_CACHE="0",
+        # Empty rather than unset, so a local .env can't turn these on
+        REDIS_URL="",
+        CONTENT_STORE_PATH="",
+        SNAPSHOT_DIR="",
+    )
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of `values`"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def measure(
+    client,
+    fake: FakeNotion,
+    paths: List[str],
+    concurrency: int = 1,
+    before_each: Callable[[], Awaitable[None]] = None
+) -> Dict[str, Any]:
+    """Request `paths` with `concurrency` clients; returns latency, throughput and Notion call metrics"""
+    fake.reset_counters()
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    pending = list(reversed(paths))
+    
+    async def worker() -> None:
+        while pending:
+            path = pending.pop()
+            if before_each is not None:
+                await before_each()
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] += 1
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    
+    notion_calls = sum(fake.calls.values())
+    return {
+        "requests": len(paths),
+        "concurrency": concurrency,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "p50_ms": round(percentile(latencies, 0.5), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "max_ms": round(max(latencies), 3),
+        "throughput_rps": round(len(paths) / elapsed, 1),
+        "notion_calls": dict(sorted(fake.calls.items())),
+        "notion_calls_per_request": round(notion_calls / len(paths), 3),
+        "notion_rate_limited": fake.rate_limited,
+    }
+
+async def run_benchmarks(fake: FakeNotion, args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    """Run every scenario against the app in this process"""
+    import httpx
+    import app.main as main
+    
+    # Per-request logging would dominate the warm timings
+    logging.disable(logging.CRITICAL)
+    
+    async def reset_all() -> None:
+        await main.cache.clear()
+        main.content_sync.reset()
+        main.negative_cache.clear()
+    
+    async def reset_posts() -> None:
+        await main.cache.clear_pattern("post_*")
+        main.content_sync.rendered.clear()
+    
+    slugs = [f"post-{number}" for number in range(args.posts)]
+    rng = random.Random(0)
+    random_posts = [f"/posts/{rng.choice(slugs)}" for _ in range(args.requests)]
+    cold_posts = [f"/posts/{slug}" for slug in slugs[:args.cold_samples]]
+    
+    results = {}
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            results["list_cold"] = await measure(client, fake, ["/posts"] * args.cold_samples, before_each=reset_all)
+            results["list_warm"] = await measure(client, fake, ["/posts"] * args.requests)
+            results["post_cold"] = await measure(client, fake, cold_posts, before_each=reset_posts)
+            
+            for slug in slugs:
+                await client.get(f"/posts/{slug}")
+            results["post_warm"] = await measure(client, fake, random_posts)
+            
+            await reset_all()
+            results["post_cold_concurrent"] = await measure(client, fake, random_posts, args.concurrency)
+            results["post_warm_concurrent"] = await measure(client, fake, random_posts, args.concurrency)
+            results["post_missing"] = await measure(
+                client, fake, [f"/posts/missing-{number}" for number in range(args.requests)], args.concurrency
+            )
+    return results
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of `results` against a previous run"""
+    regressions = []
+    for name, metrics in results["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        if metrics["notion_calls_per_request"] > previous["notion_calls_per_request"]:
+            regressions.append(
+                f"{name}: {metrics['notion_calls_per_request']} Notion calls per request "
+                f"(was {previous['notion_calls_per_request']})"
+            )
+        if metrics["p50_ms"] > previous["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {metrics['p50_ms']}ms (was {previous['p50_ms']}ms)")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the blog API against a fake Notion server")
+    parser.add_argument("--posts", type=int, default=20, help="published posts in the fake database")
+    parser.add_argument("--blocks", type=int, default=50, help="top-level blocks per post")
+    parser.add_argument("--table-rows", type=int, default=5, help="rows per table block")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every Notion request")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth Notion request with 429")
+    parser.add_argument("--notion-rate", type=float, default=1000, help="Notion request budget per second")
+    parser.add_argument("--requests", type=int, default=500, help="requests per warm and concurrent scenario")
+    parser.add_argument("--cold-samples", type=int, default=5, help="requests per cold scenario")
+    parser.add_argument("--concurrency", type=int, default=20, help="clients in the concurrent scenarios")
+    parser.add_argument("--output", default="benchmark-results.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="previous results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative p50 latency growth")
+    args = parser.parse_args()
+    
+    fake = FakeNotion(
+        posts=args.posts,
+        blocks=args.blocks,
+        table_rows=args.table_rows,
+        latency=args.latency,
+        rate_limit_every=args.rate_limit_every
+    )
+    with serve(fake) as base_url:
+        configure_environment(base_url, args.notion_rate)
+        scenarios = asyncio.run(run_benchmarks(fake, args))
+    
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "tolerance")},
+        "results": scenarios,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    
+    for name, metrics in scenarios.items():
+        print(
+            f"{name:22} p50 {metrics['p50_ms']:9.2f}ms  p95 {metrics['p95_ms']:9.2f}ms  "
+            f"{metrics['throughput_rps']:8.1f} req/s  {metrics['notion_calls_per_request']:6.3f} Notion calls/request"
+        )
+    print(f"Results written to {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks of the search index on thousands of synthetic posts.
+
+Usage: python -m benchmarks.search [--posts 5000] [--words 1000] [--queries 500]
+
+Posts are random text over a Zipf-distributed vocabulary, so queries mix
+common and rare terms like real prose. Measures building the index,
+re-indexing one edited post and query latency for one to three terms.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.search import SearchIndex
+
+def synthetic_posts(posts: int, words: int, vocabulary: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """Generated posts with a title, excerpt and `words` words of content"""
+    terms = [f"term{number}" for number in range(vocabulary)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(vocabulary)))
+    
+    def text(length: int) -> str:
+        return " ".join(rng.choices(terms, cum_weights=cum_weights, k=length))
+    
+    return [
+        {
+            "id": f"page-{number}",
+            "slug": f"post-{number}",
+            "title": text(6),
+            "excerpt": text(25),
+            "date": "2024-01-01",
+            "content": text(words),
+        }
+        for number in range(posts)
+    ]
+
+def latencies(fn: Callable[[Any], Any], inputs: List[Any]) -> Dict[str, float]:
+    """Median and 95th percentile of fn over inputs, in milliseconds"""
+    times = []
+    for value in inputs:
+        started = time.perf_counter()
+        fn(value)
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return {
+        "p50_ms": round(statistics.median(times), 3),
+        "p95_ms": round(times[min(len(times) - 1, int(0.95 * len(times)))], 3),
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the search index on synthetic posts")
+    parser.add_argument("--posts", type=int, default=5000, help="posts in the index")
+    parser.add_argument("--words", type=int, default=1000, help="words of content per post")
+    parser.add_argument("--vocabulary", type=int, default=20000, help="distinct words")
+    parser.add_argument("--queries", type=int, default=500, help="queries per scenario")
+    args = parser.parse_args()
+    
+    rng = random.Random(0)
+    posts = synthetic_posts(args.posts, args.words, args.vocabulary, rng)
+    index = SearchIndex()
+    
+    started = time.perf_counter()
+    for post in posts:
+        summary = {key: value for key, value in post.items() if key != "content"}
+        index.add(post["id"], summary, "v1", post["content"])
+    build_seconds = time.perf_counter() - started
+    
+    def reindex(post: Dict[str, Any]) -> None:
+        summary = {key: value for key, value in post.items() if key != "content"}
+        index.add(post["id"], summary, "v2", post["content"] + " edited")
+    
+    results = {"reindex_post": latencies(reindex, rng.sample(posts, min(args.queries, len(posts))))}
+    for terms in (1, 2, 3):
+        # Query words drawn from random posts, so every query has matches
+        queries = [
+            " ".join(rng.sample(rng.choice(posts)["content"].split(), terms))
+            for _ in range(args.queries)
+        ]
+        results[f"query_{terms}_terms"] = latencies(lambda query: index.search(query, limit=10), queries)
+    
+    stats = index.stats()
+    print(f"Indexed {stats['posts']} posts, {stats['terms']} terms in {build_seconds:.2f}s")
+    for name, metrics in results.items():
+        print(f"{name:16} p50 {metrics['p50_ms']:8.3f}ms  p95 {metrics['p95_ms']:8.3f}ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())